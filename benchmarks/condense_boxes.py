@@ -0,0 +1,77 @@
+import os, sys, time
+import random
+from collections import deque
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models.OCR.box_condense import condense_boxes
+
+
+# Original queue based merge, kept as the reference result
+def condense_boxes_reference(boxes, x_tol, y_tol, x_limit_px=300):
+    if not boxes:
+        return []
+    boxes = deque([tuple(b) for b in boxes])
+    results = {b: True for b in boxes}
+
+    while boxes:
+        box0 = boxes.popleft()
+        l0, t0, r0, b0 = box0[0], box0[1], box0[0]+box0[2], box0[1]+box0[3]
+
+        for box1 in list(boxes):
+            l1, t1, r1, b1 = box1[0], box1[1], box1[0]+box1[2], box1[1]+box1[3]
+            h0, h1 = box0[3], box1[3]
+
+            x_pass = not (r1 < l0 - x_tol or r0 < l1 - x_tol)
+            y_pass = abs(t1 - t0) <= y_tol and abs(h1 - h0) < min(h0, h1) * 0.5
+
+            if x_pass and y_pass:
+                nl, nr = min(l0, l1), max(r0, r1)
+                nt, nb = min(t0, t1), max(b0, b1)
+                if nr - nl >= x_limit_px:
+                    continue
+                new_box = (nl, nt, nr - nl, nb - nt)
+                results[new_box] = True
+                boxes.remove(box1)
+                boxes.append(new_box)
+                break
+
+    return [b for b, keep in results.items() if keep]
+
+
+# Text-dense screen: rows of words with jittered gaps and heights (2x upscaled coords)
+def synthetic_boxes(n, W=5120, seed=0):
+    rng = random.Random(seed)
+    boxes = []
+    y = 0
+    while len(boxes) < n:
+        row_h = rng.randint(20, 36)
+        x = rng.randint(0, 40)
+        while x < W and len(boxes) < n:
+            w = rng.randint(10, 120)
+            boxes.append((x, y + rng.randint(-3, 3), w, row_h + rng.randint(-4, 4)))
+            x += w + rng.choice([2, 4, 6, 8, 12, 40, 90])
+        y += row_h + rng.randint(6, 20)
+    rng.shuffle(boxes)
+    return boxes
+
+
+if __name__ == "__main__":
+    x_tol, y_tol = 8 * 2.0, 4 * 2.0  # host settings: box_condense=(8,4), upscale=2.0
+    skip_reference_above = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+    print(f"{'boxes':>7} | {'reference ms':>12} | {'grid ms':>9} | {'speedup':>7} | same")
+    for n in (100, 1_000, 10_000):
+        boxes = synthetic_boxes(n)
+
+        start = time.perf_counter()
+        out = condense_boxes(boxes, x_tol, y_tol)
+        grid_ms = (time.perf_counter() - start) * 1000
+
+        if n > skip_reference_above:
+            print(f"{n:>7} | {'skipped':>12} | {grid_ms:>9.1f} | {'-':>7} | -")
+            continue
+
+        start = time.perf_counter()
+        ref = condense_boxes_reference(boxes, x_tol, y_tol)
+        ref_ms = (time.perf_counter() - start) * 1000
+        print(f"{n:>7} | {ref_ms:>12.1f} | {grid_ms:>9.1f} | {ref_ms / max(grid_ms, 1e-6):>6.1f}x | {out == ref}")
@@ -0,0 +1,96 @@
+import os, sys, io, time
+import argparse
+import numpy as np
+from PIL import Image
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastAPI.frame_codec import available_codecs, encode_frame, decode_frame
+
+
+def timed(func, repeat):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best, out
+
+
+# Dashboard-like frame: flat panels, text-ish noise blocks, plus a second frame with a small change
+def synthetic_frames(W=2560, H=1440, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = np.full((H, W, 3), 235, np.uint8)
+    for _ in range(60):
+        x, y = rng.integers(0, W - 300), rng.integers(0, H - 200)
+        frame[y:y+200, x:x+300] = rng.integers(0, 255, 3, dtype=np.uint8)
+    for _ in range(400):
+        x, y = rng.integers(0, W - 120), rng.integers(0, H - 20)
+        frame[y:y+14, x:x+100] = (rng.random((14, 100, 1)) > 0.6) * 255
+    nxt = frame.copy()
+    nxt[700:740, 1200:1500] = 20  # a tooltip / counter change, ~0.3% of the screen
+    return frame, nxt
+
+
+def bench_codecs(frame, nxt, repeat):
+    rows = []
+
+    img = Image.fromarray(nxt)
+    def png_encode():
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+    enc_ms, data = timed(png_encode, repeat)
+    dec_ms, _ = timed(lambda: np.asarray(Image.open(io.BytesIO(data)).convert("RGB")), repeat)
+    rows.append(("png", enc_ms, dec_ms, len(data)))
+
+    for codec in available_codecs():
+        enc_ms, data = timed(lambda: encode_frame(nxt, codec), repeat)
+        dec_ms, out = timed(lambda: decode_frame(data, nxt.shape, codec), repeat)
+        assert np.array_equal(out, nxt)
+        rows.append((codec, enc_ms, dec_ms, len(data)))
+        if codec == "raw":
+            continue
+        enc_ms, data = timed(lambda: encode_frame(nxt, codec, frame), repeat)
+        dec_ms, out = timed(lambda: decode_frame(data, nxt.shape, codec, frame), repeat)
+        assert np.array_equal(out, nxt)
+        rows.append((codec + "+delta", enc_ms, dec_ms, len(data)))
+    return rows
+
+
+def bench_host(frames, repeat):
+    # End to end through a running host_models.py: PNG, the negotiated HTTP frame codec, shared memory
+    from fastAPI.access_models import AccessModels
+    rows = []
+    for transport, use_shm in (("png", False), (None, False), (None, True)):
+        models = AccessModels(use_shm=use_shm)
+        if transport:
+            models.frame_codec = transport
+        for i in range(repeat):
+            models.ocr_func(Image.fromarray(frames[i % len(frames)]))
+            t = models.ocr_timings
+            rows.append((t["transport"], t["encode_ms"], t["decode_ms"], t["request_ms"], t["bytes"]))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PNG vs raw frame transport timings")
+    parser.add_argument("screens", nargs="*", help="two screenshots of the same screen (optional)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--host", action="store_true", help="also time real requests against host_models.py")
+    args = parser.parse_args()
+
+    if len(args.screens) >= 2:
+        frame, nxt = (np.asarray(Image.open(p).convert("RGB")) for p in args.screens[:2])
+    else:
+        frame, nxt = synthetic_frames()
+    print(f"frame {nxt.shape[1]}x{nxt.shape[0]}, codecs: {', '.join(available_codecs())}")
+
+    print(f"{'transport':>11} | {'encode ms':>9} | {'decode ms':>9} | {'bytes':>10}")
+    for name, enc, dec, n in bench_codecs(frame, nxt, args.repeat):
+        print(f"{name:>11} | {enc:>9.1f} | {dec:>9.1f} | {n:>10,}")
+
+    if args.host:
+        print(f"\n{'transport':>11} | {'encode ms':>9} | {'decode ms':>9} | {'request ms':>10} | {'bytes':>10}")
+        for name, enc, dec, req, n in bench_host([frame, nxt], args.repeat):
+            dec = f"{dec:>9.1f}" if dec is not None else f"{'-':>9}"
+            print(f"{name:>11} | {enc:>9.1f} | {dec} | {req:>10.1f} | {n:>10,}")
@@ -0,0 +1,90 @@
+import os, sys, time, json
+import argparse
+import numpy as np
+from PIL import Image
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models.OCR.OCR import OCR, DETECTORS
+
+
+# A reference box counts as recalled when one detected box covers at least `cover` of its area
+def box_recall(ref_boxes, boxes, cover=0.5):
+    if not ref_boxes:
+        return 1.0
+    if not boxes:
+        return 0.0
+    ref = np.asarray(ref_boxes, dtype=np.float32)
+    det = np.asarray(boxes, dtype=np.float32)
+    rl, rt, rr, rb = ref[:, 0, None], ref[:, 1, None], (ref[:, 0]+ref[:, 2])[:, None], (ref[:, 1]+ref[:, 3])[:, None]
+    dl, dt, dr, db = det[:, 0], det[:, 1], det[:, 0]+det[:, 2], det[:, 1]+det[:, 3]
+    iw = np.clip(np.minimum(rr, dr) - np.maximum(rl, dl), 0, None)
+    ih = np.clip(np.minimum(rb, db) - np.maximum(rt, dt), 0, None)
+    area = np.maximum(ref[:, 2] * ref[:, 3], 1)[:, None]
+    return float(((iw * ih / area) >= cover).any(axis=1).mean())
+
+
+def load_screens(path):
+    files = sorted(f for f in os.listdir(path) if f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")))
+    screens = []
+    for f in files:
+        img = Image.open(os.path.join(path, f)).convert("RGB")
+        # Optional ground truth next to the image: name.json -> [[x,y,w,h], ...] in screen coords
+        gt_path = os.path.join(path, os.path.splitext(f)[0] + ".json")
+        gt = json.load(open(gt_path)) if os.path.exists(gt_path) else None
+        screens.append((f, img, gt))
+    return screens
+
+
+def run_backend(name, screens, args):
+    ocr = OCR(conf=0.4, downscale=1.0, max_workers=8, upscale=args.upscale, box_condense=(8,4),
+              detector=name, device=args.device)
+    ocr.detect(screens[0][1])  # warmup
+
+    out = {}
+    for f, img, _ in screens:
+        start = time.perf_counter()
+        _, scale, boxes = ocr.detect(img)
+        det_ms = (time.perf_counter() - start) * 1000
+        boxes = [(x/scale, y/scale, w/scale, h/scale) for x, y, w, h in boxes]
+
+        full_ms = None
+        if args.full:
+            start = time.perf_counter()
+            ocr(img)
+            full_ms = (time.perf_counter() - start) * 1000
+        out[f] = {"boxes": boxes, "det_ms": det_ms, "full_ms": full_ms}
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare OCR detector backends on saved screenshots")
+    parser.add_argument("screens", help="folder with screenshots (+ optional name.json ground truth boxes)")
+    parser.add_argument("--backends", default=",".join(DETECTORS), help="comma separated detector names")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--upscale", type=float, default=2.0)
+    parser.add_argument("--full", action="store_true", help="also time the full OCR call")
+    args = parser.parse_args()
+
+    screens = load_screens(args.screens)
+    if not screens:
+        sys.exit(f"No screenshots in {args.screens}")
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+
+    results = {name: run_backend(name, screens, args) for name in backends}
+
+    # Without ground truth, the first backend is the reference
+    ref_name = backends[0]
+    print(f"device={args.device}  upscale={args.upscale}  reference={'ground truth / ' if any(gt for *_, gt in screens) else ''}{ref_name}")
+    print(f"{'backend':>12} | {'det ms':>8} | {'full ms':>8} | {'boxes':>6} | recall")
+    for name in backends:
+        det_ms, full_ms, n_boxes, recalls = [], [], [], []
+        for f, _, gt in screens:
+            r = results[name][f]
+            ref = gt if gt is not None else results[ref_name][f]["boxes"]
+            det_ms.append(r["det_ms"])
+            if r["full_ms"] is not None:
+                full_ms.append(r["full_ms"])
+            n_boxes.append(len(r["boxes"]))
+            recalls.append(box_recall(ref, r["boxes"]))
+        full = f"{np.mean(full_ms):>8.1f}" if full_ms else f"{'-':>8}"
+        print(f"{name:>12} | {np.mean(det_ms):>8.1f} | {full} | {np.mean(n_boxes):>6.1f} | {np.mean(recalls):.3f}")
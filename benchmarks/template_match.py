@@ -0,0 +1,98 @@
+import os, sys, time
+import argparse
+import numpy as np
+import cv2
+from PIL import Image
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ma_utility.ocr.image_matching import template_match, template_match_exhaustive, template_features
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def load_images(path):
+    return [(f, cv2.cvtColor(np.asarray(Image.open(os.path.join(path, f)).convert("RGB")), cv2.COLOR_RGB2BGR))
+            for f in sorted(os.listdir(path)) if f.lower().endswith(IMAGE_EXTS)]
+
+
+# Busy UI-like screenshot: flat panels, text-ish noise strokes, every template pasted once at a random scale
+def synthetic_screens(templates, n=10, size=(1920, 1080), seed=0):
+    rng = np.random.default_rng(seed)
+    W, H = size
+    screens = []
+    for k in range(n):
+        img = np.empty((H, W, 3), np.uint8)
+        img[:] = rng.integers(20, 230, 3)
+        for _ in range(40):
+            x, y = int(rng.integers(0, W - 50)), int(rng.integers(0, H - 30))
+            cv2.rectangle(img, (x, y), (x + int(rng.integers(40, 400)), y + int(rng.integers(20, 200))),
+                          tuple(int(v) for v in rng.integers(0, 256, 3)), -1)
+        for _ in range(150):
+            x, y = int(rng.integers(0, W)), int(rng.integers(10, H))
+            cv2.putText(img, "Item %d" % rng.integers(1000), (x, y), cv2.FONT_HERSHEY_SIMPLEX,
+                        float(rng.uniform(.3, .8)), tuple(int(v) for v in rng.integers(0, 256, 3)), 1)
+
+        truth = {}
+        for name, t in templates:
+            s = rng.uniform(0.85, 1.15)
+            t = cv2.resize(t, (max(1, int(t.shape[1] * s)), max(1, int(t.shape[0] * s))), interpolation=cv2.INTER_AREA)
+            h, w = t.shape[:2]
+            x, y = int(rng.integers(0, W - w)), int(rng.integers(0, H - h))
+            img[y:y+h, x:x+w] = t
+            truth[name] = (x, y, w, h)
+        img = np.clip(img + rng.normal(0, 2, img.shape), 0, 255).astype(np.uint8)
+        screens.append((f"synthetic_{k}", img, truth))
+    return screens
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    return inter / (aw * ah + bw * bh - inter)
+
+
+def run(func, screens, templates):
+    boxes, times = [], []
+    for _, img, _ in screens:
+        for name, feats in templates:
+            start = time.perf_counter()
+            box, _ = func(img, feats["image"], template=feats)
+            times.append(time.perf_counter() - start)
+            boxes.append(box)
+    return boxes, np.asarray(times) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pyramid template_match vs the exhaustive full resolution search")
+    parser.add_argument("screens", nargs="?", help="folder with saved screenshots (default: synthetic screens)")
+    parser.add_argument("--templates", default="./clickable_images")
+    parser.add_argument("--n", type=int, default=10, help="number of synthetic screens")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+
+    names = [f for f in sorted(os.listdir(args.templates)) if f.lower().endswith(IMAGE_EXTS)]
+    templates = [(f, template_features(os.path.join(args.templates, f))) for f in names]
+    if args.screens:
+        screens = [(f, img, {}) for f, img in load_images(args.screens)]
+    else:
+        screens = synthetic_screens([(f, feats["image"]) for f, feats in templates], args.n)
+    truth = [t.get(name) for _, _, t in screens for name, _ in templates]
+
+    runs = [("exhaustive", run(template_match_exhaustive, screens, templates))]
+    for k in args.top_k:
+        runs.append((f"pyramid k={k}", run(lambda img, crop, template: template_match(img, crop, template=template, top_k=k),
+                                           screens, templates)))
+    ref = runs[0][1][0]
+
+    print(f"{len(screens)} screens x {len(templates)} templates, {screens[0][1].shape[1]}x{screens[0][1].shape[0]}")
+    print(f"{'search':>13} | {'ms median':>9} | {'ms p95':>7} | {'speedup':>7} | {'truth hit':>9} | {'same as exhaustive':>18}")
+    base = np.median(runs[0][1][1])
+    for name, (boxes, ms) in runs:
+        known = [(b, t) for b, t in zip(boxes, truth) if t is not None]
+        hit = f"{np.mean([b is not None and iou(b, t) >= 0.5 for b, t in known]):>9.3f}" if known else f"{'-':>9}"
+        same = np.mean([(a is None and b is None) or (a is not None and b is not None and iou(a, b) >= 0.5)
+                        for a, b in zip(boxes, ref)])
+        print(f"{name:>13} | {np.median(ms):>9.1f} | {np.percentile(ms, 95):>7.1f} | {base / np.median(ms):>6.1f}x | {hit} | {same:>18.3f}")
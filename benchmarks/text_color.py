@@ -0,0 +1,78 @@
+import os, sys, time
+import argparse
+import numpy as np
+import cv2
+from PIL import Image
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ma_utility.ocr.color_processing.get_text_color import get_text_color, get_text_colors, get_text_color_hdbscan
+from ma_utility.ocr.color_processing.color_to_text import PALETTE, get_color_names
+
+
+# Text rendered in a palette color over a flat / slightly noisy background, like UI labels
+def synthetic_crops(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    names = list(PALETTE)
+    crops = []
+    for _ in range(n):
+        name = names[rng.integers(len(names))]
+        fg = PALETTE[name][0]
+        while True:
+            bg = tuple(int(v) for v in rng.integers(0, 256, 3))
+            if np.abs(np.subtract(bg, fg)).sum() > 200:
+                break
+        h, w = int(rng.integers(18, 48)), int(rng.integers(60, 300))
+        crop = np.empty((h, w, 3), np.uint8)
+        crop[:] = bg
+        cv2.putText(crop, "Label 42", (4, h - 5), cv2.FONT_HERSHEY_SIMPLEX, h / 40, fg, max(1, h // 14))
+        crop = np.clip(crop + rng.normal(0, 3, crop.shape), 0, 255).astype(np.uint8)
+        crops.append((name, crop))
+    return crops
+
+
+def load_crops(path):
+    # Optional truth from the file name: "red_something.png"
+    crops = []
+    for f in sorted(os.listdir(path)):
+        if not f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")):
+            continue
+        prefix = f.split("_")[0].lower()
+        crops.append((prefix if prefix in PALETTE else None, np.asarray(Image.open(os.path.join(path, f)).convert("RGB"))))
+    return crops
+
+
+def run(name, func, crops):
+    start = time.perf_counter()
+    colors = func([c for _, c in crops])
+    ms = (time.perf_counter() - start) * 1000
+    return name, get_color_names(colors), ms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fast text color estimator vs the HDBSCAN one")
+    parser.add_argument("crops", nargs="?", help="folder with text crops (default: synthetic labels)")
+    parser.add_argument("--n", type=int, default=200)
+    parser.add_argument("--no-reference", action="store_true", help="skip the slow HDBSCAN estimator")
+    args = parser.parse_args()
+
+    crops = load_crops(args.crops) if args.crops else synthetic_crops(args.n)
+    truth = [t for t, _ in crops]
+
+    runs = [
+        run("fast", lambda cs: [get_text_color(c) for c in cs], crops),
+        run("fast batch", get_text_colors, crops),
+    ]
+    if not args.no_reference:
+        try:
+            runs.append(run("hdbscan", lambda cs: [get_text_color_hdbscan(c) for c in cs], crops))
+        except ImportError as e:
+            print(f"hdbscan reference unavailable: {e}")
+    ref = dict((n, names) for n, names, _ in runs).get("hdbscan")
+
+    print(f"{len(crops)} crops")
+    print(f"{'estimator':>11} | {'ms/crop':>8} | {'truth acc':>9} | {'agree w/ hdbscan':>16}")
+    for name, names, ms in runs:
+        known = [(p, t) for p, t in zip(names, truth) if t is not None]
+        acc = f"{np.mean([p == t for p, t in known]):>9.3f}" if known else f"{'-':>9}"
+        agree = f"{np.mean([a == b for a, b in zip(names, ref)]):>16.3f}" if ref else f"{'-':>16}"
+        print(f"{name:>11} | {ms / len(crops):>8.2f} | {acc} | {agree}")
@@ -0,0 +1,150 @@
+import os
+import atexit
+import tempfile
+import threading
+from collections import OrderedDict
+from core.logging import get_logger
+log = get_logger(__name__)
+
+
+class ByteLRU:
+    """
+    Byte-budgeted LRU with hit/miss/eviction counters, shared by the
+    recognition, embedding and template caches. Callers give each value's
+    size; the oldest entries go once the total passes max_bytes, keeping at
+    least min_entries. All methods are thread safe.
+    """
+    def __init__(self, max_bytes, min_entries=0):
+        self.max_bytes = max_bytes
+        self.min_entries = min_entries
+        self.entries = OrderedDict()  # {key: (value, nbytes)}
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    # -> [(key, value)] evicted to make room
+    def put(self, key, value, nbytes):
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self.entries[key] = (value, nbytes)
+            self.size += nbytes
+            evicted = []
+            while self.size > self.max_bytes and len(self.entries) > self.min_entries:
+                old_key, (old_value, n) = self.entries.popitem(last=False)
+                self.size -= n
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+            return evicted
+
+    def pop(self, key):
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            self.size -= entry[1]
+            return entry[0]
+
+    # Evicts and returns the least recently used (key, value), None when empty
+    def pop_oldest(self):
+        with self._lock:
+            if not self.entries:
+                return None
+            key, (value, n) = self.entries.popitem(last=False)
+            self.size -= n
+            self.evictions += 1
+            return key, value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    # Snapshot of (key, value), oldest first
+    def items(self):
+        with self._lock:
+            return [(key, value) for key, (value, _) in self.entries.items()]
+
+    def stats(self, **extra):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            **extra,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# Writes data (bytes, or a function taking the open file) to path through a temp file of its own,
+# so concurrent writers never share one and readers only ever see a complete file
+def atomic_write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if callable(data):
+                data(f)
+            else:
+                f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Autosave:
+    """
+    Calls save() on a background thread once `every` changes were marked, and
+    once more at exit. Saves never overlap, so a slow snapshot can't be
+    replaced by an older one, and the caller that crossed the threshold
+    doesn't pay for the write.
+    """
+    def __init__(self, save, every, name="autosave"):
+        self.save = save
+        self.every = every
+        self.pending = 0
+        self._cond = threading.Condition()
+        self._save_lock = threading.Lock()
+        self.worker = threading.Thread(target=self._loop, name=name, daemon=True)
+        self.worker.start()
+        atexit.register(self.flush)
+
+    def mark(self, n=1):
+        with self._cond:
+            self.pending += n
+            if self.pending >= self.every:
+                self._cond.notify()
+
+    def flush(self):
+        with self._save_lock:
+            with self._cond:
+                self.pending = 0
+            self.save()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self.pending < self.every:
+                    self._cond.wait()
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning(f"Background save failed: {e}")
@@ -1,9 +1,61 @@
 import requests
 import io, PIL
+import time, uuid
+import numpy as np
+from fastAPI.frame_codec import available_codecs, encode_frame, PREFERRED_CODECS
+from fastAPI.shm_ring import FrameRing
+from fastAPI.embed_cache import EmbeddingStore, normalize_text
+
+
+# Columnar OCR response -> the usual lines of (box, text, crop). Crops are views into the
+# screenshot the client already holds, unless the host was asked to send PNG crops.
+# When the host sent text colors, items become (box, text, crop, {"color", "color_name"}).
+def columnar_to_lines(res, frame: np.ndarray):
+    crops = res.get("crops")
+    colors, color_names = res.get("color"), res.get("color_name")
+    lines = []
+    for i, (box, text, line) in enumerate(zip(res["boxes"], res["text"], res["line"])):
+        if line >= len(lines):
+            lines.append([])
+        if crops is not None:
+            crop = crops[i]
+        else:
+            x, y, w, h = box
+            crop = frame[y:y+h, x:x+w]
+        if color_names is not None:
+            lines[line].append((box, text, crop, {"color": colors[i], "color_name": color_names[i]}))
+        else:
+            lines[line].append((box, text, crop))
+    return lines
+
 class AccessModels:
-    def __init__(self):
+    def __init__(self, frame_delta=True, use_shm=True, ocr_layout="columnar", ocr_crops=False, emb_dtype="float16",
+                 emb_cache_path="./models/emb_cache", emb_cache_bytes=64*1024*1024):
         self.base = "http://127.0.0.1:5555"
         self.session = requests.Session()
+        self.caps = None  # host /capabilities, fetched once
+        # Wire dtype of /embed responses, embd_func always returns a float32 (n, dim) matrix
+        self.emb_dtype = emb_dtype
+        # Persistent per-model embedding store, opened once the host names its model (None disables)
+        self.emb_cache_path = emb_cache_path
+        self.emb_cache_bytes = emb_cache_bytes
+        self.emb_store = None
+
+        # Frame transport for OCR, negotiated on first use: a codec name or "png"
+        self.frame_codec = None
+        self.frame_delta = frame_delta
+        self.frame_session = uuid.uuid4().hex
+        self.frame_seq = 0
+        self.prev_frame = None  # last frame the host acknowledged, delta base for the next one
+        self.prev_seq = None    # its X-Frame-Seq, a failed request may have advanced frame_seq past it
+        # Shared-memory slots when the host runs on this machine, HTTP frames otherwise
+        self.use_shm = use_shm
+        self.shm_ring = None
+        # Response layout, "columnar" falls back to "lines" on hosts that don't offer it
+        self.ocr_layout = ocr_layout
+        self.ocr_crops = ocr_crops
+        self.last_ocr = None  # last columnar response, has per box confidences
+        self.ocr_timings = {}  # last call: transport, encode_ms, decode_ms, request_ms, bytes
 
     # ---------- helpers ----------
 
@@ -40,8 +92,45 @@ class AccessModels:
                 raise TypeError("All elements of texts must be strings")
         else:
             raise TypeError(f"embd_func expects str or list[str], got {type(texts)}")
-        
-        return self._post("embed", {"text": texts}, timeout=120)
+        if not texts:
+            return np.empty((0, 0), np.float32)
+
+        texts = [normalize_text(t) for t in texts]
+        store = self._emb_store()
+        rows = store.get_many(texts) if store else [None] * len(texts)
+        missing = list(dict.fromkeys(t for t, row in zip(texts, rows) if row is None))
+        if not missing:
+            return np.stack(rows)
+
+        embs = self._embed_remote(missing)
+        if store:
+            store.put_many(missing, embs)
+        new = dict(zip(missing, embs))
+        return np.stack([new[t] if row is None else row for t, row in zip(texts, rows)])
+
+    def _emb_store(self):
+        if self.emb_store is None and self.emb_cache_path:
+            model = (self._capabilities() or {}).get("emb_model")
+            if model:
+                self.emb_store = EmbeddingStore(self.emb_cache_path, model, self.emb_cache_bytes)
+        return self.emb_store
+
+    def _embed_remote(self, texts):
+        # Binary float16 matrix from hosts that support it, JSON lists from older ones
+        r = self.session.post(f"{self.base}/embed", json={"text": texts}, params={"dtype": self.emb_dtype}, timeout=120)
+        try:
+            r.raise_for_status()
+        except requests.HTTPError as e:
+            raise RuntimeError(f"POST /embed failed ({r.status_code}): {r.text}") from e
+        if r.headers.get("content-type", "").startswith("application/octet-stream"):
+            shape = tuple(int(v) for v in r.headers["x-emb-shape"].split(","))
+            embs = np.frombuffer(r.content, dtype=r.headers["x-emb-dtype"]).reshape(shape)
+            return np.ascontiguousarray(embs, dtype=np.float32)
+
+        data = r.json()
+        if isinstance(data, dict) and "error" in data:
+            raise RuntimeError(data["error"] + "\n" + data.get("traceback", ""))
+        return np.asarray(data, dtype=np.float32).reshape(len(texts), -1)
 
 
     def gpt_func(self, input_text: str):
@@ -51,16 +140,139 @@ class AccessModels:
             timeout=300
         )
 
+    # Host capabilities, {} for hosts without the endpoint, None while they can't be fetched
+    def _capabilities(self):
+        if self.caps is None:
+            try:
+                r = self.session.get(f"{self.base}/capabilities", timeout=5)
+                if r.status_code in (404, 405):
+                    self.caps = {}
+                else:
+                    r.raise_for_status()
+                    self.caps = r.json()
+            except (requests.RequestException, ValueError):
+                return None  # host down or still loading, ask again next call
+        return self.caps
+
+    # Codec for this call, remembered only once the host answered /capabilities
+    def _negotiate_frame_codec(self):
+        caps = self._capabilities()
+        if caps is None:
+            return "png"
+        host_codecs = caps.get("frame_codecs", [])
+        if self.ocr_layout not in caps.get("ocr_layouts", ["lines"]):
+            self.ocr_layout = "lines"
+        if self.use_shm and caps.get("shm") and self.shm_ring is None:
+            self.shm_ring = FrameRing()
+        local = available_codecs()
+        self.frame_codec = next((c for c in PREFERRED_CODECS if c in host_codecs and c in local), "png")
+        return self.frame_codec
+
     def ocr_func(self, img: PIL.Image):
+        codec = self.frame_codec or self._negotiate_frame_codec()
+        data = None
+        if self.shm_ring is not None:
+            data = self._ocr_shm(img)
+        if data is None:
+            data = self._ocr_png(img) if codec == "png" else self._ocr_frame(img)
+
+        if isinstance(data, dict) and data.get("layout") == "columnar":
+            self.last_ocr = data
+            return columnar_to_lines(data, np.asarray(img.convert("RGB")))
+        return data
+
+    def _ocr_params(self):
+        return {"layout": self.ocr_layout, "crops": str(self.ocr_crops).lower()}
+
+    def _ocr_shm(self, img: PIL.Image):
+        start = time.perf_counter()
+        frame = np.asarray(img.convert("RGB"))
+        slot, payload = self.shm_ring.write(frame)
+        encode_ms = (time.perf_counter() - start) * 1000
+        try:
+            start = time.perf_counter()
+            # Network errors are raised, the ring is only dropped when the host can't attach it
+            r = self.session.post(f"{self.base}/ocr_shm", json=payload, params=self._ocr_params(), timeout=120)
+            if r.status_code == 404:
+                # Host can't see our segments (remote / container), use HTTP frames from now on
+                self.shm_ring.close()
+                self.shm_ring = None
+                return None
+            r.raise_for_status()
+            data = r.json()
+        finally:
+            if self.shm_ring is not None:
+                self.shm_ring.release(slot)
+
+        self.ocr_timings = {"transport": "shm", "encode_ms": encode_ms, "decode_ms": None,
+                            "request_ms": (time.perf_counter() - start) * 1000, "bytes": len(str(payload))}
+        if isinstance(data, dict) and "error" in data:
+            raise RuntimeError(data["error"] + "\n" + data.get("traceback", ""))
+        return data
+
+    def _ocr_png(self, img: PIL.Image):
+        start = time.perf_counter()
         buf = io.BytesIO()
         img.save(buf, format="PNG")
         buf.seek(0)
+        encode_ms = (time.perf_counter() - start) * 1000
 
+        start = time.perf_counter()
         resp = self.session.post(
             f"{self.base}/ocr",
             files={"file": ("screenshot.png", buf, "image/png")},
             data={},
+            params=self._ocr_params(),
             timeout=120
         )
         resp.raise_for_status()
-        return resp.json()
\ No newline at end of file
+        self.ocr_timings = {"transport": "png", "encode_ms": encode_ms, "decode_ms": None,
+                            "request_ms": (time.perf_counter() - start) * 1000, "bytes": buf.getbuffer().nbytes}
+        return resp.json()
+
+    def _ocr_frame(self, img: PIL.Image, allow_delta=True):
+        frame = np.asarray(img.convert("RGB"))
+        codec = self.frame_codec
+        # Delta only pays off with a compressor, raw XOR is as big as the frame
+        use_delta = (allow_delta and self.frame_delta and codec != "raw"
+                     and self.prev_frame is not None and self.prev_frame.shape == frame.shape)
+
+        start = time.perf_counter()
+        payload = encode_frame(frame, codec, self.prev_frame if use_delta else None)
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        self.frame_seq += 1
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "X-Frame-Shape": ",".join(map(str, frame.shape)),
+            "X-Frame-Codec": codec,
+            "X-Frame-Session": self.frame_session,
+            "X-Frame-Seq": str(self.frame_seq),
+        }
+        if use_delta:
+            headers["X-Frame-Base"] = str(self.prev_seq)
+
+        start = time.perf_counter()
+        # Network errors are raised, only a host without the endpoint switches transport
+        r = self.session.post(f"{self.base}/ocr_frame", data=payload, headers=headers,
+                              params=self._ocr_params(), timeout=120)
+        if r.status_code in (404, 405):
+            # Host without the frame endpoint, stay on PNG from now on
+            self.frame_codec = "png"
+            return self._ocr_png(img)
+        if r.status_code == 409 and use_delta:
+            # Host lost the delta base (restart / evicted session), resend the full frame
+            self.prev_frame = None
+            return self._ocr_frame(img, allow_delta=False)
+        r.raise_for_status()
+        request_ms = (time.perf_counter() - start) * 1000
+
+        self.prev_frame, self.prev_seq = frame, self.frame_seq
+        decode_ms = r.headers.get("x-decode-ms")
+        self.ocr_timings = {"transport": codec + ("+delta" if use_delta else ""), "encode_ms": encode_ms,
+                            "decode_ms": float(decode_ms) if decode_ms else None,
+                            "request_ms": request_ms, "bytes": len(payload)}
+        data = r.json()
+        if isinstance(data, dict) and "error" in data:
+            raise RuntimeError(data["error"] + "\n" + data.get("traceback", ""))
+        return data
\ No newline at end of file
@@ -0,0 +1,124 @@
+import time
+import threading
+from collections import deque
+import numpy as np
+
+
+class _Pending:
+    __slots__ = ("texts", "arrived", "done", "result", "error")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.arrived = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class EmbedBatcher:
+    """
+    Coalesces concurrent embed requests: everything that arrives within
+    `window_ms` of the first waiting request is encoded in one model call,
+    identical strings only once, and the rows are fanned back out.
+    """
+    def __init__(self, encode, window_ms=3.0, max_batch=256, history=1000):
+        self.encode = encode  # list[str] -> (n, dim) array
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.queued_texts = 0
+
+        # Recent batches for tuning the window: (requests, texts, unique, queue_depth, wait_ms, encode_ms)
+        self.batches = deque(maxlen=history)
+        self.requests = 0
+
+        self.worker = threading.Thread(target=self._loop, name="embed-batcher", daemon=True)
+        self.worker.start()
+
+    def __call__(self, texts):
+        if not texts:
+            return np.empty((0, 0), np.float32)
+        req = _Pending(list(texts))
+        with self.cond:
+            self.queue.append(req)
+            self.queued_texts += len(req.texts)
+            self.requests += 1
+            self.cond.notify()
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def _take_batch(self):
+        with self.cond:
+            while not self.queue:
+                self.cond.wait()
+            # Collect until the window after the first arrival closes or the batch is full
+            deadline = self.queue[0].arrived + self.window
+            while self.queued_texts < self.max_batch:
+                left = deadline - time.perf_counter()
+                if left <= 0:
+                    break
+                self.cond.wait(left)
+
+            depth = len(self.queue)
+            batch, n = [], 0
+            while self.queue and (not batch or n + len(self.queue[0].texts) <= self.max_batch):
+                req = self.queue.popleft()
+                batch.append(req)
+                n += len(req.texts)
+            self.queued_texts -= n
+            return batch, depth
+
+    def _loop(self):
+        # Nothing may escape: a dead worker would leave every later caller waiting forever
+        while True:
+            batch = []
+            try:
+                batch, depth = self._take_batch()
+                self._run_batch(batch, depth)
+            except Exception as e:
+                for req in batch:
+                    if not req.done.is_set():
+                        req.error = e
+                        req.done.set()
+
+    def _run_batch(self, batch, depth):
+        start = time.perf_counter()
+        unique = {}  # {text: row}
+        rows = [[unique.setdefault(t, len(unique)) for t in req.texts] for req in batch]
+        try:
+            embs = np.asarray(self.encode(list(unique)))
+            for req, idx in zip(batch, rows):
+                req.result = embs[idx]
+        except Exception as e:
+            for req in batch:
+                req.error = e
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        for req in batch:
+            req.done.set()
+        wait_ms = (start - min(req.arrived for req in batch)) * 1000
+        self.batches.append((len(batch), sum(len(i) for i in rows), len(unique), depth, wait_ms, encode_ms))
+
+    def stats(self):
+        batches = list(self.batches)
+        if not batches:
+            return {"requests": self.requests, "batches": 0, "queue_depth": len(self.queue)}
+        reqs, texts, unique, depth, wait_ms, encode_ms = np.asarray(batches, dtype=np.float64).T
+        return {
+            "requests": self.requests,
+            "batches": len(batches),
+            "queue_depth": len(self.queue),
+            "window_ms": self.window * 1000,
+            "avg_requests_per_batch": float(reqs.mean()),
+            "avg_batch_size": float(unique.mean()),
+            "max_batch_size": int(unique.max()),
+            "dedup_ratio": float(1 - unique.sum() / max(texts.sum(), 1)),
+            "avg_queue_depth": float(depth.mean()),
+            "max_queue_depth": int(depth.max()),
+            "avg_wait_ms": float(wait_ms.mean()),
+            "avg_encode_ms": float(encode_ms.mean()),
+        }
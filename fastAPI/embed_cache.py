@@ -0,0 +1,147 @@
+import os
+import re
+import struct
+import hashlib
+import threading
+import unicodedata
+from collections import deque
+import numpy as np
+from core.cache import ByteLRU, atomic_write, Autosave
+
+
+def normalize_text(text):
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingLRU:
+    """Host side byte-budgeted LRU of text -> embedding row, sits in front of the encoder."""
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.lru = ByteLRU(max_bytes)  # {text: float32 row}
+
+    def embed(self, texts, encode):
+        if not texts:
+            return np.empty((0, 0), np.float32)
+        rows = [self.lru.get(t) for t in texts]
+
+        missing = list(dict.fromkeys(t for t, row in zip(texts, rows) if row is None))
+        if missing:
+            new = dict(zip(missing, np.asarray(encode(missing), dtype=np.float32)))
+            for t, row in new.items():
+                self.lru.put(t, row, row.nbytes + len(t))
+            rows = [new[t] if row is None else row for t, row in zip(texts, rows)]
+        return np.stack(rows)
+
+    def stats(self):
+        return self.lru.stats()
+
+
+# Index file: header | uint32 dim | uint32 capacity | records of 8-byte key + uint32 row, oldest first
+_HEADER = b"EMBS1"
+_META = struct.Struct("<II")
+_RECORD = struct.Struct("<8sI")
+
+
+class EmbeddingStore:
+    """
+    Client side persistent embedding cache, one pair of files per model.
+    Rows live in a float16 memory-mapped matrix sized to `max_bytes`, a small
+    index maps hash(model, normalized text) -> row. The least recently used
+    row is overwritten when the matrix is full. The index is written in the
+    background every `save_every` new entries and at exit; every row also
+    records its own key, so rows overwritten after the last index save are
+    never served.
+    """
+    def __init__(self, path, model_name, max_bytes=64 * 1024 * 1024, save_every=200):
+        slug = re.sub(r"[^\w.-]", "_", model_name)
+        self.model_name = model_name
+        self.idx_path = os.path.join(path, slug + ".idx")
+        self.emb_path = os.path.join(path, slug + ".emb")
+        self.keys_path = os.path.join(path, slug + ".keys")
+        self.max_bytes = max_bytes
+        self.lru = ByteLRU(max_bytes)  # {key: row}, sized in matrix bytes
+        self.free = deque()
+        self.matrix = None
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self.load()
+        self.autosave = Autosave(self.save, save_every, name="emb-store-save")
+
+    def key(self, text):
+        h = hashlib.blake2b(self.model_name.encode(), digest_size=8)
+        h.update(b"\0" + normalize_text(text).encode("utf-8"))
+        return h.digest()
+
+    def _open(self, dim, capacity=None, mode="w+"):
+        capacity = capacity or max(1, self.max_bytes // (dim * 2))
+        self.matrix = np.memmap(self.emb_path, dtype=np.float16, mode=mode, shape=(capacity, dim))
+        self.row_keys = np.memmap(self.keys_path, dtype="<u8", mode=mode, shape=(capacity,))
+        self.free = deque(range(capacity))
+        self.lru.clear()
+        self.lru.max_bytes = capacity * dim * 2
+
+    def get_many(self, texts):
+        keys = [self.key(t) for t in texts]
+        with self._lock:
+            rows = [self.lru.get(key) for key in keys]
+            return [None if row is None else np.asarray(self.matrix[row], dtype=np.float32) for row in rows]
+
+    def put_many(self, texts, embs):
+        embs = np.asarray(embs)
+        if not len(texts) or embs.ndim != 2:
+            return
+        with self._lock:
+            if self.matrix is None or self.matrix.shape[1] != embs.shape[1]:
+                self._open(embs.shape[1])
+            row_bytes = embs.shape[1] * 2
+            for text, emb in zip(texts, embs):
+                key = self.key(text)
+                row = self.lru.pop(key)
+                if row is None:
+                    row = self.free.popleft() if self.free else self.lru.pop_oldest()[1]
+                self.row_keys[row] = 0
+                self.matrix[row] = emb
+                self.row_keys[row] = int.from_bytes(key, "little")
+                self.lru.put(key, row, row_bytes)
+        self.autosave.mark(len(texts))
+
+    def stats(self):
+        return self.lru.stats()
+
+    # ---------- persistence ----------
+
+    def save(self):
+        with self._lock:
+            if self.matrix is None:
+                return
+            self.matrix.flush()
+            self.row_keys.flush()
+            buf = bytearray(_HEADER) + _META.pack(self.matrix.shape[1], self.matrix.shape[0])
+            for key, row in self.lru.items():  # oldest first, so load keeps LRU order
+                buf += _RECORD.pack(key, row)
+        atomic_write(self.idx_path, bytes(buf))
+
+    def load(self):
+        if not all(os.path.exists(p) for p in (self.idx_path, self.emb_path, self.keys_path)):
+            return
+        with open(self.idx_path, "rb") as f:
+            data = f.read()
+        if not data.startswith(_HEADER) or len(data) < len(_HEADER) + _META.size:
+            return
+        dim, capacity = _META.unpack_from(data, len(_HEADER))
+        # A changed byte budget starts a fresh store
+        if (capacity != max(1, self.max_bytes // (dim * 2)) or os.path.getsize(self.emb_path) != dim * capacity * 2
+                or os.path.getsize(self.keys_path) != capacity * 8):
+            return
+
+        with self._lock:
+            self._open(dim, capacity, mode="r+")
+            pos = len(_HEADER) + _META.size
+            while pos + _RECORD.size <= len(data):
+                key, row = _RECORD.unpack_from(data, pos)
+                pos += _RECORD.size
+                if row < capacity and self.row_keys[row] == int.from_bytes(key, "little"):
+                    self.lru.put(key, row, dim * 2)
+            self.lru.evictions = 0
+            used = {row for _, row in self.lru.items()}
+            self.free = deque(r for r in range(capacity) if r not in used)
@@ -0,0 +1,61 @@
+import zlib
+import numpy as np
+
+# Optional fast compressors, raw and zlib always work
+try:
+    import lz4.frame as lz4f
+except ImportError:
+    lz4f = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def available_codecs():
+    codecs = ["raw", "zlib"]
+    if lz4f is not None:
+        codecs.append("lz4")
+    if zstandard is not None:
+        codecs.append("zstd")
+    return codecs
+
+# Client preference, the first one both sides support wins
+PREFERRED_CODECS = ["zstd", "lz4", "raw"]
+
+
+def _compress(data, codec):
+    if codec == "raw":
+        return bytes(data)
+    if codec == "zlib":
+        return zlib.compress(data, 1)
+    if codec == "lz4":
+        return lz4f.compress(data)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=1).compress(data)
+    raise ValueError(f"Unknown frame codec: {codec}")
+
+def _decompress(data, codec):
+    if codec == "raw":
+        return data
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "lz4":
+        return lz4f.decompress(data)
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown frame codec: {codec}")
+
+
+# Delta = XOR against the previous frame, unchanged pixels become zeros and compress to almost nothing
+def encode_frame(frame: np.ndarray, codec="raw", prev: np.ndarray = None):
+    frame = np.ascontiguousarray(frame, dtype=np.uint8)
+    if prev is not None:
+        frame = np.bitwise_xor(frame, prev)
+    return _compress(frame.data, codec)
+
+def decode_frame(data: bytes, shape, codec="raw", prev: np.ndarray = None):
+    frame = np.frombuffer(_decompress(data, codec), dtype=np.uint8).reshape(shape)
+    if prev is not None:
+        frame = np.bitwise_xor(frame, prev)
+    return frame
@@ -1,7 +1,11 @@
 import os
 import logging
 import traceback
-from fastapi import FastAPI, UploadFile, File
+import time
+import threading
+from collections import OrderedDict
+from fastapi import FastAPI, UploadFile, File, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import uvicorn
 from PIL import Image
@@ -10,7 +14,13 @@ import io, sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from models.OCR.OCR import OCR
 from models.qwen06voice_to_command import generate, setup_gpt_model
-from models.embeddings import embed_text, get_emb_model
+from models.embeddings import embed_text, get_emb_model, STModel_name
+from fastAPI.frame_codec import available_codecs, decode_frame
+from fastAPI.shm_ring import FrameReader
+from fastAPI.embed_batcher import EmbedBatcher
+from fastAPI.embed_cache import EmbeddingLRU
+from ma_utility.ocr.color_processing.get_text_color import get_text_colors
+from ma_utility.ocr.color_processing.color_to_text import get_color_names, load_color_table
 
 import io, base64
 from PIL import Image
@@ -22,6 +32,42 @@ def crop_to_base64(crop: np.ndarray) -> str:
     pil_img.save(buffer, format="PNG")
     return base64.b64encode(buffer.getvalue()).decode("utf-8")
 
+# layout="lines": [[(box, text, b64 png crop), ...], ...] as before.
+# layout="columnar": flat boxes/text/conf arrays plus the line index of every box and
+# the text color / color name when OCR_COLORS is on, the client slices crops from its
+# own screenshot; PNG crops only when asked for with crops=true.
+def ocr_response(img: Image.Image | np.ndarray, layout="lines", crops=False):
+    if layout != "columnar":
+        ocr_res = ocr(img)
+        return [
+            [(b, t, crop_to_base64(crop)) for b, t, crop in line]
+            for line in ocr_res
+        ]
+
+    ocr_res = ocr(img, return_conf=True, return_color=True)
+    items = [(i, item) for i, line in enumerate(ocr_res) for item in line]
+    res = {
+        "layout": "columnar",
+        "boxes": [b for _, (b, _, _, _, _) in items],
+        "text": [t for _, (_, t, _, _, _) in items],
+        "conf": [round(c, 4) for _, (_, _, _, c, _) in items],
+        "line": [i for i, _ in items],
+    }
+    if ocr.color_func is not None:
+        colors = [color for _, (_, _, _, _, color) in items]
+        res["color"] = [list(c[:3]) if c else None for c in colors]
+        res["color_name"] = [c[3] if c else None for c in colors]
+    if crops:
+        res["crops"] = [crop_to_base64(crop) for _, (_, _, crop, _, _) in items]
+    return res
+
+# Dominant text color + palette name per crop, computed by the OCR pass
+def text_colors(crops):
+    rgbs = get_text_colors(crops)
+    known = [rgb for rgb in rgbs if rgb is not None]
+    names = iter(get_color_names(known) if known else [])
+    return [(*(int(v) for v in np.clip(rgb, 0, 255)), next(names)) if rgb is not None else None for rgb in rgbs]
+
 # -------------------- setup --------------------
 
 logging.basicConfig(level=logging.ERROR)
@@ -33,9 +79,28 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 app = FastAPI(title="Local ML Model Host")
 
 # load models ONCE
-ocr = OCR(conf=0.4, downscale=1.0, max_workers=8, upscale=2.0, box_condense=(8,4))
+# OCR_DET_BATCH sets how many 800x800 tiles CRAFT takes per forward pass (GPU memory is shared with the LLM),
+# OCR_DEVICE=cpu + OCR_DETECTOR=paddle_db for CPU-only hosts,
+# OCR_ADAPTIVE_UPSCALE=1 detects at native size and upscales only small text crops,
+# OCR_TRACK_ALLOC=1 adds per-call allocation peaks to /stats,
+# OCR_COLORS=0 turns off the per-box text color in columnar responses
+ocr = OCR(conf=0.4, downscale=1.0, max_workers=8, upscale=2.0, box_condense=(8,4), incremental=True,
+          rec_cache_path="./models/OCR/rec_cache.bin", blank_thresh=0.0003,
+          detector=os.environ.get("OCR_DETECTOR", "craft"),
+          device=os.environ.get("OCR_DEVICE", "cuda"),
+          det_batch=int(os.environ.get("OCR_DET_BATCH", "2")),
+          adaptive_upscale=os.environ.get("OCR_ADAPTIVE_UPSCALE", "0") == "1",
+          track_alloc=os.environ.get("OCR_TRACK_ALLOC", "0") == "1",
+          color_func=text_colors if os.environ.get("OCR_COLORS", "1") == "1" else None)
+if ocr.color_func is not None:
+    load_color_table()  # keep the one-off table build out of the first OCR request
 gpt_model, gpt_tokenizer, get_prompt_func = setup_gpt_model()
 emb_model = get_emb_model()
+# Concurrent /embed calls within EMBED_WINDOW_MS share one encode batch
+embed_batcher = EmbedBatcher(lambda texts: embed_text(texts, emb_model),
+                             window_ms=float(os.environ.get("EMBED_WINDOW_MS", "3")))
+# Repeated strings are answered from memory and never wait for a batch
+embed_cache = EmbeddingLRU(max_bytes=int(os.environ.get("EMBED_CACHE_MB", "64")) * 1024 * 1024)
 
 print("✅ Models loaded, FastAPI ready")
 
@@ -47,16 +112,41 @@ class EmbedReq(BaseModel):
 class GPTReq(BaseModel):
     input: str
 
+# Last decoded frame per client session, base for delta-encoded frames
+frame_sessions = OrderedDict()  # {session: (seq, frame)}
+frame_sessions_lock = threading.Lock()
+MAX_FRAME_SESSIONS = 8
+
+# Shared-memory frames from a client on the same machine
+shm_frames = FrameReader()
+
+class ShmFrameReq(BaseModel):
+    name: str
+    shape: tuple[int, int, int]
+
 class OCRReq(BaseModel):
     img: bytes
     ocr_crop_offset: tuple[int, int]
 
 # -------------------- endpoints --------------------
 
+EMBED_DTYPES = ("float16", "float32")
+
+# ?dtype=float16|float32 returns the raw (n, dim) matrix instead of JSON lists,
+# dtype and shape travel in the x-emb-dtype / x-emb-shape headers
 @app.post("/embed")
-def embed(req: EmbedReq):
+def embed(req: EmbedReq, dtype: str | None = None):
     try:
-        embs = embed_text(req.text, emb_model)
+        # one empty string would fail the whole shared batch, reject it here
+        if not all(t.strip() for t in req.text):
+            raise ValueError("embed texts must be non-empty")
+        embs = embed_cache.embed(req.text, embed_batcher)
+        if dtype in EMBED_DTYPES:
+            embs = np.ascontiguousarray(embs, dtype=dtype)
+            if embs.size == 0:
+                embs = embs.reshape(0, 0)
+            return Response(content=embs.tobytes(), media_type="application/octet-stream",
+                            headers={"x-emb-dtype": dtype, "x-emb-shape": ",".join(map(str, embs.shape))})
         if hasattr(embs, "tolist"):
             embs = embs.tolist()
         return embs
@@ -66,6 +156,11 @@ def embed(req: EmbedReq):
             "traceback": traceback.format_exc()
         }
 
+@app.get("/stats")
+def stats():
+    return {"ocr_rec_cache": ocr.box_cache.stats(), "ocr_last_call": ocr.call_stats,
+            "embed_batcher": embed_batcher.stats(), "embed_cache": embed_cache.stats()}
+
 @app.post("/gpt")
 def gpt(req: GPTReq):
     try:
@@ -77,24 +172,83 @@ def gpt(req: GPTReq):
         }
 
 @app.post("/ocr")
-def ocr_api(file: UploadFile = File(...)):
+def ocr_api(file: UploadFile = File(...), layout: str = "lines", crops: bool = False):
     try:
         img_bytes = file.file.read()
         img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+        return ocr_response(img, layout, crops)
+    except Exception:
+        import traceback
+        return {
+            "error": "ocr failed",
+            "traceback": traceback.format_exc()
+        }
 
-        ocr_res = ocr(img)
+@app.get("/capabilities")
+def capabilities():
+    return {"frame_codecs": available_codecs(), "frame_delta": True, "shm": True,
+            "ocr_layouts": ["lines", "columnar"], "emb_model": STModel_name}
 
-        ocr_res_base64 = [
-            [(b, t, crop_to_base64(crop)) for b, t, crop in line]
-            for line in ocr_res
-        ]
-        return ocr_res_base64
+# Raw RGB frame transport: body is the (optionally compressed / delta) frame,
+# shape and encoding travel in headers. Replies 409 when the delta base is unknown.
+@app.post("/ocr_frame")
+async def ocr_frame(request: Request, response: Response, layout: str = "lines", crops: bool = False):
+    body = await request.body()
+    return await run_in_threadpool(ocr_frame_sync, body, request.headers, response, layout, crops)
+
+def ocr_frame_sync(body, headers, response, layout="lines", crops=False):
+    try:
+        start = time.perf_counter()
+        shape = tuple(int(v) for v in headers["x-frame-shape"].split(","))
+        codec = headers.get("x-frame-codec", "raw")
+        session = headers.get("x-frame-session", "")
+        seq = int(headers.get("x-frame-seq", "0"))
+        base = headers.get("x-frame-base")
+
+        prev = None
+        if base is not None:
+            with frame_sessions_lock:
+                last = frame_sessions.get(session)
+            if last is None or last[0] != int(base) or last[1].shape != shape:
+                response.status_code = 409
+                return {"error": "delta base unknown"}
+            prev = last[1]
+
+        frame = decode_frame(body, shape, codec, prev)
+        with frame_sessions_lock:
+            frame_sessions[session] = (seq, frame)
+            frame_sessions.move_to_end(session)
+            while len(frame_sessions) > MAX_FRAME_SESSIONS:
+                frame_sessions.popitem(last=False)
+        response.headers["x-decode-ms"] = f"{(time.perf_counter() - start) * 1000:.2f}"
+
+        return ocr_response(frame, layout, crops)
+    except Exception:
+        return {
+            "error": "ocr failed",
+            "traceback": traceback.format_exc()
+        }
+
+# Zero-copy frame handoff: the client wrote the RGB frame into a shared-memory
+# slot, the body only names the slot. The slot stays untouched until we reply.
+@app.post("/ocr_shm")
+def ocr_shm(req: ShmFrameReq, response: Response, layout: str = "lines", crops: bool = False):
+    try:
+        frame = shm_frames.read(req.name, req.shape)
+    except (FileNotFoundError, ValueError, TypeError):
+        # Different machine / container or a stale segment, the client falls back to HTTP
+        response.status_code = 404
+        return {"error": "shared memory segment not found"}
+    try:
+        return ocr_response(frame, layout, crops)
     except Exception:
-        import traceback
         return {
             "error": "ocr failed",
             "traceback": traceback.format_exc()
         }
+    finally:
+        del frame  # our view would keep the segment from closing if release evicts it
+        shm_frames.release(req.name)
 
 # -------------------- run --------------------
 
@@ -0,0 +1,100 @@
+import os
+import threading
+from collections import OrderedDict
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class FrameRing:
+    """
+    Client side ring of shared-memory frame slots. A slot is held from
+    write() until release(), so concurrent callers never overwrite a frame
+    the host is still reading. Slots grow (new segment) when a bigger
+    frame arrives.
+    """
+    def __init__(self, slots=4):
+        self.segments = [None] * slots
+        self.free = list(range(slots))
+        self.cond = threading.Condition()
+
+    def write(self, frame: np.ndarray):
+        with self.cond:
+            while not self.free:
+                self.cond.wait()
+            slot = self.free.pop()
+
+        shm = self.segments[slot]
+        if shm is None or shm.size < frame.nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = self.segments[slot] = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        np.ndarray(frame.shape, np.uint8, buffer=shm.buf)[:] = frame
+        return slot, {"name": shm.name, "shape": list(frame.shape)}
+
+    def release(self, slot):
+        with self.cond:
+            self.free.append(slot)
+            self.cond.notify()
+
+    def close(self):
+        for shm in self.segments:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        self.segments = [None] * len(self.segments)
+
+
+def _attach(name):
+    # The client owns the segments, the host must not unlink them on exit
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class FrameReader:
+    """
+    Host side: attaches to client segments once and returns zero-copy frame
+    views. A segment is held from read() until release(); beyond
+    max_segments only segments no request holds are closed.
+    """
+    def __init__(self, max_segments=16):
+        self.segments = OrderedDict()  # {name: SharedMemory}
+        self.users = {}  # {name: number of requests holding a view}
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+
+    def read(self, name, shape):
+        with self.lock:
+            shm = self.segments.get(name)
+            if shm is None:
+                shm = self.segments[name] = _attach(name)
+            self.segments.move_to_end(name)
+            # frombuffer exports the buffer, so close() refuses while any view of it is alive
+            frame = np.frombuffer(shm.buf, np.uint8, int(np.prod(shape))).reshape(shape)
+            self.users[name] = self.users.get(name, 0) + 1
+            self._evict()
+        return frame
+
+    def release(self, name):
+        with self.lock:
+            self.users[name] -= 1
+            if not self.users[name]:
+                del self.users[name]
+            self._evict()
+
+    # Oldest idle segments first. close() raises BufferError while a view outlives
+    # its request, such a segment stays attached until a later pass.
+    def _evict(self):
+        idle = [name for name in self.segments if name not in self.users]
+        for name in idle[:max(0, len(self.segments) - self.max_segments)]:
+            try:
+                self.segments[name].close()
+            except BufferError:
+                continue
+            del self.segments[name]
@@ -1,11 +1,12 @@
 # ---- Embeddings ----
 from .embeddings.event_embeddings import embd_events
 from .embeddings.similarity import cosine_sim, hybrid_score, cmp_txt_and_embs
-from .embeddings.text_matching import get_matching_str, extract_action
+from .embeddings.text_matching import get_matching_str, extract_action, ActionMatcher, action_match_stats
 
 # ---- OCR ----
-from .ocr.image_matching import get_target_image, find_crop_in_image
-from .ocr.image_utils import base64_to_crop, image_hash, image_diff_percent
+from .ocr.image_matching import get_target_image, find_crop_in_image, template_cache_stats
+from .ocr.image_index import image_index_stats
+from .ocr.image_utils import base64_to_crop, as_crop, image_hash, image_diff_percent
 from .ocr.ocr_processing import embd_ocr_lines, filter_numbers
 from .ocr.screenshot import screenshot_raw, take_screenshot, scale_screenshot_box
 
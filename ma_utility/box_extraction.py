@@ -1,8 +1,12 @@
+import numpy as np
+import jellyfish
+from rapidfuzz import fuzz, process
 from core.state import RuntimeState
 from ma_utility.embeddings.similarity import hybrid_score
-from ma_utility.ocr.image_utils import base64_to_crop
-from ma_utility.ocr.color_processing.get_text_color import get_text_color
-from ma_utility.ocr.color_processing.color_to_text import get_color_name
+from ma_utility.text.normalize import normalize_word
+from ma_utility.ocr.image_utils import as_crop
+from ma_utility.ocr.color_processing.get_text_color import get_text_colors
+from ma_utility.ocr.color_processing.color_to_text import get_color_names
 from ma_utility.text.numbers import parse_sign_number
 from core.logging import get_logger
 log = get_logger(__name__) 
@@ -15,6 +19,60 @@ def extract_target_context(action_span, context):
 
 
 
+class CandidateTable:
+    """
+    OCR items of one frame laid out for scoring: flat item list, lowercase and
+    normalized texts, metaphones and a row-normalized embedding matrix, all built
+    once. Text colors come from the host when it sent them, the rest are
+    filled in lazily and kept for the frame as well.
+    """
+    def __init__(self, embd_lines):
+        self.embd_lines = embd_lines
+        self.items = [item for line in embd_lines for item in line if isinstance(item, dict)]
+        self.texts = [item["text"].lower() for item in self.items]
+        self.norm = [normalize_word(t) for t in self.texts]
+        self.metaphones = [jellyfish.metaphone(t) for t in self.norm]
+        self.matrix = None
+        if self.items:
+            embs = np.stack([np.asarray(item["embedding"], dtype=np.float32) for item in self.items])
+            self.matrix = embs / np.linalg.norm(embs, axis=1, keepdims=True)
+        self.colors = {i: item["color_name"] for i, item in enumerate(self.items) if item.get("color_name")}  # {item index: color name}
+
+    # hybrid_score of the query against every item
+    def scores(self, query, query_emb):
+        a = normalize_word(query)
+        ph = process.cdist([jellyfish.metaphone(a)], self.metaphones, scorer=fuzz.ratio, dtype=np.float64)[0]
+        fz = process.cdist([a], self.norm, scorer=fuzz.ratio, dtype=np.float64)[0]
+        query_emb = np.asarray(query_emb, dtype=np.float32)
+        cos = self.matrix @ (query_emb / np.linalg.norm(query_emb))
+        return .45 * (ph / 100) + 0.35 * (fz / 100) + 0.20 * cos
+
+    # Color names of the given items, missing ones estimated in one batch
+    def color_names(self, idxs):
+        missing = [i for i in idxs if i not in self.colors]
+        if missing:
+            for i, name in zip(missing, text_color_names([self.items[i].get("crop") for i in missing])):
+                self.colors[i] = name
+        return [self.colors[i] for i in idxs]
+
+
+def text_color_names(crops):
+    rgbs = get_text_colors([as_crop(c) for c in crops])
+    known = [i for i, rgb in enumerate(rgbs) if rgb is not None]
+    names = [None] * len(rgbs)
+    for i, name in zip(known, get_color_names([rgbs[i] for i in known]) if known else []):
+        names[i] = name
+    return names
+
+
+_table = None
+def get_candidate_table(embd_lines):
+    global _table
+    if _table is None or _table.embd_lines is not embd_lines:
+        _table = CandidateTable(embd_lines)
+    return _table
+
+
 def extract_box_from_string_target(rs: RuntimeState, embd_lines, return_all=False):
     boost_alpha = 0.2
     color_boost = 1.15
@@ -30,43 +88,31 @@ def extract_box_from_string_target(rs: RuntimeState, embd_lines, return_all=Fals
         return None
     ctx_emb = ctx_emb[0]
 
-    if return_all:
-        results = []
+    table = get_candidate_table(embd_lines)
+    if not table.items:
+        return None
+    sims = table.scores(ctx, ctx_emb)
 
-    best = {"score": -1, "query": ctx, "result": None}
+    # Boost ONLY if full query matches
+    exact = np.array([t == ctx for t in table.texts])
+    sims[exact] *= 1 + boost_alpha * (len(ctx.split()) - 1)
 
-    for line in embd_lines:
-        for item in line:
-            if not isinstance(item, dict): 
-                log.debug(f"Item in wrong format: {item}")
-            item_text = item["text"].lower()
-
-            sim = hybrid_score(ctx, item_text, ctx_emb, item["embedding"])
-
-            # Boost ONLY if full query matches
-            if ctx == item_text:
-                sim *= 1 + boost_alpha * (len(ctx.split()) - 1)
-
-            # Color adjustments
-            if sim > 0.6 and item.get("crop") and rs.color_list:
-                np_crop = base64_to_crop(item["crop"])
-                color_rgb = get_text_color(np_crop)
-                color_text = get_color_name(color_rgb)
-                sim *= color_boost if color_text in rs.color_list else color_penalty
-
-            if return_all:
-                if sim > 0.6:
-                    r = {k: v for k, v in item.items() if k != "embedding"}
-                    results.append({"score": sim, "query": ctx, "result": r})
-            else:
-                if sim > best["score"]:
-                    r = {k: v for k, v in item.items() if k != "embedding"}
-                    best.update({"score": sim, "query": ctx, "result": r})
+    # Color adjustments
+    if rs.color_list:
+        idxs = [i for i in np.flatnonzero(sims > 0.6) if i in table.colors or table.items[i].get("crop") is not None]
+        for i, color_text in zip(idxs, table.color_names(idxs)):
+            sims[i] *= color_boost if color_text in rs.color_list else color_penalty
+
+    def result(i):
+        r = {k: v for k, v in table.items[i].items() if k != "embedding"}
+        return {"score": float(sims[i]), "query": ctx, "result": r}
 
     if return_all:
+        results = [result(i) for i in np.flatnonzero(sims > 0.6)]
         return results if results else None
     else:
-        return best if best["score"] > 0.6 else None
+        best = int(np.argmax(sims))
+        return result(best) if sims[best] > 0.6 else None
     
 
     
@@ -121,9 +167,10 @@ def extract_box_from_numeric_target(rs: RuntimeState, embd_lines, return_all=Fal
                 continue
             if not all(compare(s, t, val) for s, t in rules):
                 continue
-            np_crop = base64_to_crop(it.get("crop"))
-            color_text = get_color_name(get_text_color(np_crop)) if np_crop is not None else None
-            candidates.append({"item": it, "val": val, "color": color_text, "bbox": it["bbox"]})
+            candidates.append({"item": it, "val": val, "color": it.get("color_name"), "bbox": it["bbox"]})
+    missing = [c for c in candidates if c["color"] is None]
+    for c, color_text in zip(missing, text_color_names([c["item"].get("crop") for c in missing])):
+        c["color"] = color_text
 
     # batch embed unique candidate colors
     unique_colors = {c["color"] for c in candidates if c["color"] and color_list}
@@ -135,7 +182,7 @@ def extract_box_from_numeric_target(rs: RuntimeState, embd_lines, return_all=Fal
         color = c["color"]
         if color_list and color:
             vec = color_emb_map.get(color)
-            if not vec:
+            if vec is None:
                 continue
             if max(hybrid_score(cl, color, ce, vec) for cl, ce in zip(color_list, colors_emb)) < 0.65:
                 continue
@@ -6,21 +6,39 @@ from ma_utility.text.normalize import normalize_word
 def cosine_sim(a, b):
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
+# (n, dim) x (m, dim) -> (n, m) cosine matrix in one matmul
+def cosine_sim_matrix(A, B):
+    A = np.atleast_2d(np.asarray(A, dtype=np.float32))
+    B = np.atleast_2d(np.asarray(B, dtype=np.float32))
+    if A.size == 0 or B.size == 0:
+        return np.zeros((len(A), len(B)), np.float32)
+    A = A / np.linalg.norm(A, axis=1, keepdims=True)
+    B = B / np.linalg.norm(B, axis=1, keepdims=True)
+    return A @ B.T
+
+def _fuzzy_score(a, b):
+    ph = fuzz.ratio(jellyfish.metaphone(a), jellyfish.metaphone(b)) / 100
+    fz = fuzz.ratio(a,b)/100
+    return .45 * ph + 0.35 * fz
+
 def hybrid_score(span, item_text, span_emb, item_emb):
     a, b = normalize_word(span), normalize_word(item_text)
     cos = cosine_sim(span_emb, item_emb)
-    ph = fuzz.ratio(jellyfish.metaphone(a), jellyfish.metaphone(b)) / 100
-    fz = fuzz.ratio(a,b)/100
-    return .45 * ph + 0.35 * fz + 0.20 * cos
+    return _fuzzy_score(a, b) + 0.20 * cos
 
+# hybrid_score of one span against many items, cosines from a single matmul
+def hybrid_scores(span, item_texts, span_emb, item_embs):
+    a = normalize_word(span)
+    fuzzy = np.array([_fuzzy_score(a, normalize_word(t)) for t in item_texts], dtype=np.float32)
+    return fuzzy + 0.20 * cosine_sim_matrix(span_emb, item_embs)[0]
 
-def cmp_txt_and_embs(text, emb_pairs, embd_func):
-    emb1 = embd_func(text)
-    best = {"score": -1, "text": None}
 
-    for emb2, txt in emb_pairs:
-        sim = cosine_sim(emb1, emb2)
-        if sim > best["score"]:
-            best.update({"score": sim, "text": txt})
+def cmp_txt_and_embs(text, emb_pairs, embd_func):
+    emb_pairs = list(emb_pairs)
+    if not emb_pairs:
+        return None
+    embs, texts = zip(*emb_pairs)
 
-    return best if best["score"] >= 0.9 else None
\ No newline at end of file
+    sims = cosine_sim_matrix(embd_func(text), np.stack(embs))[0]
+    i = int(np.argmax(sims))
+    return {"score": float(sims[i]), "text": texts[i]} if sims[i] >= 0.9 else None
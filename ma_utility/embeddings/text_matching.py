@@ -1,20 +1,104 @@
-from ma_utility.embeddings.similarity import hybrid_score
+import numpy as np
+import jellyfish
+from rapidfuzz import fuzz, process
+from ma_utility.embeddings.similarity import hybrid_score, hybrid_scores
+from ma_utility.text.normalize import normalize_word
+from ma_utility.text.phrase_trie import PhraseTrie
+from core.logging import get_logger
+log = get_logger(__name__)
 
 ACTION_SCORE_THRESH = 0.6
 
 def get_matching_str(ctx: str, cands: list, embd_func):
     assert isinstance(ctx, str)
     assert all(isinstance(c, str) for c in cands)
+    if not cands:
+        return ""
 
-    in_embd = embd_func(ctx)
-    cand_embds = zip(cands, embd_func(cands))
+    sims = hybrid_scores(ctx, cands, embd_func(ctx), embd_func(cands))
+    return cands[int(np.argmax(sims))]
 
-    best = {"score": -1, "result": ""}
-    for cand, cand_embd in cand_embds:
-        sim = hybrid_score(ctx, cand, in_embd, cand_embd)
-        if sim > best["score"]:
-            best = {"score": sim, "result": cand}
-    return best["result"]
+
+class ActionMatcher:
+    """
+    Alias side of extract_action, computed once per event list: normal forms,
+    metaphones and the row-normalized alias embedding matrix. Scoring a
+    context is then one matmul plus two rapidfuzz cdist calls.
+    """
+    def __init__(self, event_embeds):
+        self.event_embeds = event_embeds
+        self.aliases = [alias.lower() for alias, _, _ in event_embeds]
+        self.buttons = [buttons for _, _, buttons in event_embeds]
+        self.norm = [normalize_word(alias) for alias in self.aliases]
+        self.metaphones = [jellyfish.metaphone(a) for a in self.norm]
+        embs = np.stack([np.asarray(emb, dtype=np.float32) for _, emb, _ in event_embeds])
+        self.matrix = embs / np.linalg.norm(embs, axis=1, keepdims=True)
+        self.alias_idx = {}  # {lowercase alias: [columns]} for the exact match boost
+        for i, alias in enumerate(self.aliases):
+            self.alias_idx.setdefault(alias, []).append(i)
+
+        # Lexical fast path over the same aliases, value = column. Only aliases a span can equal
+        # exactly (single spaced) go in, since the embedding path boosts exact equality only
+        self.trie = PhraseTrie((alias, i) for i, alias in enumerate(self.aliases) if " ".join(alias.split()) == alias)
+        self.fast_hits = self.fast_misses = 0
+
+    # An exact alias scores ~1.0 (times the multi-word boost), no partial match can beat it, so the
+    # longest exact alias in the context is what the embedding matcher would pick anyway. Tokens are
+    # compared lowercased only, like the exact test there ("save," is not "save"). Equally long exact
+    # aliases go to the leftmost, where the embedding path splits them by float rounding.
+    def fast_match(self, words, max_n=8, boost_alpha=0.1):
+        hit = self.trie.longest_match([w.lower() for w in words], max_n)
+        if hit is None:
+            self.fast_misses += 1
+            return None
+        start, n, ai = hit
+        self.fast_hits += 1
+        return {"score": 1 + boost_alpha * (n - 1), "span": " ".join(words[start:start + n]), "result": self.buttons[ai]}
+
+    def stats(self):
+        total = self.fast_hits + self.fast_misses
+        return {"fast_hits": self.fast_hits, "fast_misses": self.fast_misses,
+                "fast_hit_rate": self.fast_hits / total if total else 0.0}
+
+    def scores(self, spans, span_embs, boost_alpha=0.1):
+        norm = [normalize_word(span) for span in spans]
+        ph = process.cdist([jellyfish.metaphone(a) for a in norm], self.metaphones, scorer=fuzz.ratio, dtype=np.float32)
+        fz = process.cdist(norm, self.norm, scorer=fuzz.ratio, dtype=np.float32)
+        span_embs = np.asarray(span_embs, dtype=np.float32)
+        cos = (span_embs / np.linalg.norm(span_embs, axis=1, keepdims=True)) @ self.matrix.T
+        sim = .45 * (ph / 100) + 0.35 * (fz / 100) + 0.20 * cos
+
+        for si, span in enumerate(spans):
+            cols = self.alias_idx.get(span.lower())
+            if cols:
+                sim[si, cols] *= (1 + boost_alpha * (len(span.split()) - 1))
+        return sim
+
+    def match(self, spans, span_embs, boost_alpha=0.1):
+        sim = self.scores(spans, span_embs, boost_alpha)
+
+        # Pairs within float noise of the top are re-scored with the scalar hybrid_score and
+        # scanned span-major with a strict >, so ties resolve exactly like the old double loop
+        best = {"score": -1, "span": None, "result": None}
+        for si, ai in zip(*np.nonzero(sim >= sim.max() - 1e-4)):
+            span, (alias, alias_emb, buttons) = spans[si], self.event_embeds[ai]
+            score = hybrid_score(span, alias, span_embs[si], alias_emb)
+            if span.lower() == alias.lower():
+                score *= (1 + boost_alpha * (len(span.split()) - 1))
+            if score > best["score"]:
+                best = {"score": score, "span": span, "result": buttons}
+        return best
+
+
+_matcher = None
+def get_action_matcher(event_embeds):
+    global _matcher
+    if _matcher is None or _matcher.event_embeds is not event_embeds:
+        _matcher = ActionMatcher(event_embeds)
+    return _matcher
+
+def action_match_stats():
+    return _matcher.stats() if _matcher is not None else None
 
 
 def extract_action(context_text, event_embeds, embd_func, max_n=8, boost_alpha=0.1):
@@ -25,17 +109,15 @@ def extract_action(context_text, event_embeds, embd_func, max_n=8, boost_alpha=0
         for i in range(len(words) - n + 1):
             spans.append(" ".join(words[i:i+n]))
 
-    if not spans: return None
-    span_embs = embd_func(spans)
+    if not spans or not event_embeds: return None
+    matcher = get_action_matcher(event_embeds)
 
-    best = {"score": -1, "span": None, "result": None}
+    # Well-formed commands ("click save", "press ctrl s") resolve without embedding anything
+    best = matcher.fast_match(words, max_n, boost_alpha)
+    if best is not None:
+        log.debug(f"extract_action() => fast path '{best['span']}' ({matcher.stats()['fast_hit_rate']:.0%} hit rate)")
+        return best
 
-    for span, s_emb in zip(spans, span_embs):
-        for alias, alias_emb, buttons in event_embeds:
-            sim = hybrid_score(span, alias, s_emb, alias_emb)
-            if span.lower() == alias.lower():
-                sim *= (1 + boost_alpha * (len(span.split()) - 1))
-            if sim > best["score"]:
-                best = {"score": sim, "span": span, "result": buttons}
+    best = matcher.match(spans, embd_func(spans), boost_alpha)
 
-    return best if best["score"] > ACTION_SCORE_THRESH else None
\ No newline at end of file
+    return best if best["score"] > ACTION_SCORE_THRESH else None
@@ -1,4 +1,10 @@
+import os
+import glob
 import math
+import hashlib
+import threading
+import numpy as np
+from core.cache import atomic_write
 
 PALETTE = {
     "black": [(0,0,0), (25,25,25), (50,50,50), (10,10,10), (35,35,35)],
@@ -90,21 +96,136 @@ for name, rgbs in PALETTE.items():
         rgbs = [rgbs]
     PALETTE_LAB[name] = [rgb_to_lab(*rgb) for rgb in rgbs]
 
+
+# ---- Vectorized versions, same formulas as above ----
+
+def rgb_to_lab_np(rgb):
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    lin = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+    xyz = lin @ np.array([[0.4124564, 0.2126729, 0.0193339],
+                          [0.3575761, 0.7151522, 0.1191920],
+                          [0.1804375, 0.0721750, 0.9503041]])
+    t = xyz / np.array([0.95047, 1.0, 1.08883])
+    f = np.where(t > 0.008856, np.cbrt(t), 7.787037*t + 16/116)
+    return np.stack([116*f[..., 1] - 16, 500*(f[..., 0] - f[..., 1]), 200*(f[..., 1] - f[..., 2])], axis=-1)
+
+# (N, 3) x (M, 3) LAB -> (N, M) distances
+def ciede2000_np(lab1, lab2):
+    lab1 = np.asarray(lab1, dtype=np.float64)[:, None, :]
+    lab2 = np.asarray(lab2, dtype=np.float64)[None, :, :]
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+    C1, C2 = np.hypot(a1, b1), np.hypot(a2, b2)
+    avg_C = 0.5*(C1+C2)
+    G = 0.5*(1 - np.sqrt((avg_C**7)/(avg_C**7+25**7)))
+    a1p, a2p = (1+G)*a1, (1+G)*a2
+    C1p, C2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    nonzero = C1p*C2p != 0
+    dh = h2p - h1p
+    dhp = np.where(np.abs(dh) <= 180, dh, np.where(dh > 180, dh - 360, dh + 360))
+    dhp = np.where(nonzero, dhp, 0)
+    dHp = 2*np.sqrt(C1p*C2p)*np.sin(np.radians(dhp/2))
+    avg_Lp = (L1+L2)/2
+    avg_Cp = (C1p+C2p)/2
+    hsum = h1p + h2p
+    avg_hp = np.where(np.abs(h1p - h2p) <= 180, hsum/2, np.where(hsum < 360, (hsum+360)/2, (hsum-360)/2))
+    avg_hp = np.where(nonzero, avg_hp, hsum)
+    T = 1 - 0.17*np.cos(np.radians(avg_hp-30)) + 0.24*np.cos(np.radians(2*avg_hp)) + \
+        0.32*np.cos(np.radians(3*avg_hp+6)) - 0.20*np.cos(np.radians(4*avg_hp-63))
+    delta_ro = 30*np.exp(-((avg_hp-275)/25)**2)
+    Rc = 2*np.sqrt((avg_Cp**7)/(avg_Cp**7+25**7))
+    Sl = 1 + (0.015*((avg_Lp-50)**2))/np.sqrt(20+(avg_Lp-50)**2)
+    Sc = 1 + 0.045*avg_Cp
+    Sh = 1 + 0.015*avg_Cp*T
+    Rt = -np.sin(np.radians(2*delta_ro))*Rc
+    return np.sqrt((dLp/Sl)**2 + (dCp/Sc)**2 + (dHp/Sh)**2 + Rt*(dCp/Sc)*(dHp/Sh))
+
+def _flat_palette(palette_lab):
+    names = [name for name, labs in palette_lab.items() for _ in labs]
+    return names, np.array([lab for labs in palette_lab.values() for lab in labs], dtype=np.float64)
+
 def match_color_name(rgb, palette_lab=PALETTE_LAB, top_n=1):
-    lab = rgb_to_lab(*rgb)
-    distances = []
-    for name, lab_list in palette_lab.items():
-        for lab_p in lab_list:
-            d = ciede2000(lab, lab_p)
-            distances.append((name, d))
-    distances.sort(key=lambda x: x[1])
-    return distances[:top_n] if top_n != 1 else distances[:1]
+    names, labs = _flat_palette(palette_lab)
+    d = ciede2000_np(rgb_to_lab_np([rgb]), labs)[0]
+    order = np.argsort(d, kind="stable")[:top_n]
+    return [(names[i], float(d[i])) for i in order]
+
+# Exact naming of many colors: nearest palette entry + bright gray -> white
+def _name_colors(rgbs, palette_lab=PALETTE_LAB):
+    rgbs = np.asarray(rgbs, dtype=np.float64).reshape(-1, 3)
+    names, labs = _flat_palette(palette_lab)
+    keys = list(dict.fromkeys(names))
+    entry_key = np.array([keys.index(n) for n in names])
+    idx = entry_key[ciede2000_np(rgb_to_lab_np(rgbs), labs).argmin(axis=1)]
+    if "gray" in keys and "white" in keys:
+        idx[(idx == keys.index("gray")) & (rgbs > 230).all(axis=1)] = keys.index("white")
+    return keys, idx
+
+
+# ---- Quantized lookup table ----
+# 64^3 RGB buckets (4 levels each) -> palette name index, uint8, memory-mapped from a file
+# named after a hash of PALETTE so an edited palette builds a fresh table.
+LUT_BITS = 6
+_LUT_DIR = os.path.dirname(os.path.abspath(__file__))
+_lut = None
+_lut_names = None
+_lut_lock = threading.Lock()
+
+def _palette_hash():
+    return hashlib.blake2b(repr(list(PALETTE.items())).encode(), digest_size=6).hexdigest()
+
+def _build_lut(path):
+    levels = 1 << LUT_BITS
+    step = 256 // levels
+    centers = np.arange(levels) * step + (step - 1) / 2
+    r, g, b = np.meshgrid(centers, centers, centers, indexing="ij")
+    grid = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+    lut = np.empty(len(grid), np.uint8)
+    for i in range(0, len(grid), 16384):
+        _, lut[i:i+16384] = _name_colors(grid[i:i+16384])
+
+    # Host and client may build at the same time: each writes its own temp file,
+    # the table is identical, so whichever replace lands last is fine
+    atomic_write(path, lut.tofile)
+
+def _lut_ready(path):
+    return os.path.exists(path) and os.path.getsize(path) == 1 << (3 * LUT_BITS)
+
+def _load_lut():
+    global _lut, _lut_names
+    with _lut_lock:
+        if _lut is None:
+            path = os.path.join(_LUT_DIR, f"color_lut_{_palette_hash()}.u8")
+            if not _lut_ready(path):
+                for old in glob.glob(os.path.join(_LUT_DIR, "color_lut_*.u8")):
+                    if old != path:
+                        try:
+                            os.remove(old)
+                        except FileNotFoundError:
+                            pass
+                _build_lut(path)
+            _lut_names = list(PALETTE)
+            _lut = np.memmap(path, dtype=np.uint8, mode="r")
+    return _lut, _lut_names
+
+# Builds (~7 s on first run) or maps the color name table now instead of on the first lookup
+def load_color_table():
+    _load_lut()
+
+# Names for an (N, 3) batch of RGB colors with one table lookup
+def get_color_names(rgbs):
+    lut, names = _load_lut()
+    q = np.clip(np.asarray(rgbs, dtype=np.float64).reshape(-1, 3), 0, 255).astype(np.int64) >> (8 - LUT_BITS)
+    idx = lut[(q[:, 0] << (2 * LUT_BITS)) | (q[:, 1] << LUT_BITS) | q[:, 2]]
+    return [names[i] for i in idx]
 
 # --- Get color string ---
 def get_color_name(rgb, palette=PALETTE_LAB):
-    best_name, dist = match_color_name(rgb, palette_lab=palette, top_n=1)[0]
-
-    # bright gray → white
-    if best_name == "gray" and rgb[0]>230 and rgb[1]>230 and rgb[2]>230:
-        return "white"
-    return best_name
\ No newline at end of file
+    if palette is not PALETTE_LAB:
+        keys, idx = _name_colors([rgb], palette)
+        return keys[idx[0]]
+    return get_color_names([rgb])[0]
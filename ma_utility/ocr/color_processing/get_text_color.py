@@ -1,9 +1,6 @@
 import math
 import numpy as np
 import cv2
-import hdbscan
-from sklearn.neighbors import NearestNeighbors
-from skimage.measure import regionprops, label
 
 import warnings
 warnings.filterwarnings(
@@ -12,19 +9,112 @@ warnings.filterwarnings(
     category=FutureWarning
 )
 
+def dominant_color(pixels, bin_size=8):
+    """
+    Return the most frequent color in LAB pixels using coarse binning.
+    """
+    bins = (pixels // bin_size).astype(int)
+    keys = bins[:,0]*256*256 + bins[:,1]*256 + bins[:,2]
+    vals, counts = np.unique(keys, return_counts=True)
+    top_bin = vals[np.argmax(counts)]
+    l = (top_bin // (256*256)) * bin_size
+    a = ((top_bin // 256) % 256) * bin_size
+    b = (top_bin % 256) * bin_size
+    return np.array([l, a, b])
+
+
+def _border_mask(h, w, thick):
+    mask = np.zeros((h, w), dtype=bool)
+    mask[:thick,:] = True
+    mask[-thick:,:] = True
+    mask[:,:thick] = True
+    mask[:,-thick:] = True
+    return mask
+
+
+# ---- Fast estimator ----
+# Per crop: nearest-neighbour downsample to <= max_pixels (keeps pure stroke colors),
+# background = dominant LAB color of the border, then a few k-means iterations seeded
+# with the background and the pixels farthest from it. The cluster that is far from the
+# background, big enough and mostly off the border is the text. All crops of a frame
+# run through the k-means together.
+
+def _sample(crop, max_pixels):
+    h, w = crop.shape[:2]
+    s = min(1.0, math.sqrt(max_pixels / max(h * w, 1)))
+    if s < 1.0:
+        crop = cv2.resize(crop, (max(1, int(w * s)), max(1, int(h * s))), interpolation=cv2.INTER_NEAREST)
+    return np.ascontiguousarray(crop[..., :3], dtype=np.uint8), s
+
+def get_text_colors(crops, k=3, iters=6, max_pixels=1024):
+    out = [None] * len(crops)
+    jobs = []  # (index, rgb pixels, lab pixels, border mask, bg, bg_std)
+    for i, crop in enumerate(crops):
+        if crop is None or crop.size == 0:
+            continue
+        small, s = _sample(crop, max_pixels)
+        h, w = small.shape[:2]
+        rgb = small.reshape(-1, 3)
+        lab = cv2.cvtColor(small, cv2.COLOR_RGB2LAB).reshape(-1, 3).astype(np.float32)
+        if min(h, w) < 3:
+            out[i] = rgb.mean(axis=0)
+            continue
+        thick = max(1, int(round(max(3, min(crop.shape[:2]) * 0.04) * s)))
+        border = _border_mask(h, w, min(thick, min(h, w) // 2)).ravel()
+        bg = dominant_color(lab[border].astype(np.uint8)).astype(np.float32) + 4  # bin center
+        bg_std = np.maximum(lab[border].std(axis=0), 5.0)
+        jobs.append((i, rgb, lab, border, bg, bg_std))
+    if not jobs:
+        return out
+
+    # Pad every crop to the same pixel count so k-means runs on (crops, pixels, 3)
+    P = max(len(j[2]) for j in jobs)
+    B = len(jobs)
+    lab = np.zeros((B, P, 3), np.float32)
+    valid = np.zeros((B, P), bool)
+    for b, (_, _, px, _, _, _) in enumerate(jobs):
+        lab[b, :len(px)] = px
+        valid[b, :len(px)] = True
+
+    # Seeds: background, then repeatedly the pixel farthest from all chosen centers
+    centers = np.zeros((B, k, 3), np.float32)
+    centers[:, 0] = np.stack([j[4] for j in jobs])
+    dmin = np.where(valid, np.linalg.norm(lab - centers[:, :1], axis=2), -1)
+    for c in range(1, k):
+        centers[:, c] = lab[np.arange(B), dmin.argmax(axis=1)]
+        dmin = np.minimum(dmin, np.where(valid, np.linalg.norm(lab - centers[:, c:c+1], axis=2), -1))
+
+    for _ in range(iters):
+        d = ((lab[:, :, None, :] - centers[:, None, :, :]) ** 2).sum(axis=3)  # (B, P, k)
+        assign = d.argmin(axis=2)
+        onehot = (assign[..., None] == np.arange(k)) & valid[..., None]    # (B, P, k)
+        counts = onehot.sum(axis=1)                                         # (B, k)
+        sums = np.einsum("bpk,bpc->bkc", onehot.astype(np.float32), lab)
+        centers = np.where(counts[..., None] > 0, sums / np.maximum(counts, 1)[..., None], centers)
+
+    for b, (i, rgb, px, border, bg, bg_std) in enumerate(jobs):
+        n = len(px)
+        a = assign[b, :n]
+        cnt = counts[b]
+        dist_from_bg = np.linalg.norm((centers[b] - bg) / np.maximum(bg_std, np.array([8.0, 6.0, 6.0])), axis=1)
+        on_border = np.array([(border & (a == c)).sum() for c in range(k)]) / np.maximum(cnt, 1)
+        border_penalty = np.clip(1.0 - on_border, 0.3, 1.0)
+        size_weight = np.minimum(cnt / max(cnt.max(), 1), 0.5)
+        scores = dist_from_bg * size_weight * border_penalty
+        scores[cnt < max(3, n // 200)] = -1
+        best = int(scores.argmax())
+        out[i] = rgb[a == best].mean(axis=0) if scores[best] > 0 else rgb.mean(axis=0)
+    return out
+
 def get_text_color(crop):
-    def dominant_color(pixels, bin_size=8):
-        """
-        Return the most frequent color in LAB pixels using coarse binning.
-        """
-        bins = (pixels // bin_size).astype(int)
-        keys = bins[:,0]*256*256 + bins[:,1]*256 + bins[:,2]
-        vals, counts = np.unique(keys, return_counts=True)
-        top_bin = vals[np.argmax(counts)]
-        l = (top_bin // (256*256)) * bin_size
-        a = ((top_bin // 256) % 256) * bin_size
-        b = (top_bin % 256) * bin_size
-        return np.array([l, a, b])
+    return get_text_colors([crop])[0]
+
+
+# ---- Reference estimator (HDBSCAN), slow: kept for benchmarks/text_color.py ----
+def get_text_color_hdbscan(crop):
+    import hdbscan
+    from sklearn.neighbors import NearestNeighbors
+    from skimage.measure import regionprops, label
 
     h, w, _ = crop.shape
     pixels = crop.reshape(-1, 3).astype(np.uint8)
@@ -49,11 +139,7 @@ def get_text_color(crop):
 
     # Background estimation
     border_thick = max(3, int(min(h, w) * 0.04))
-    border_mask = np.zeros((h, w), dtype=bool)
-    border_mask[:border_thick,:] = True
-    border_mask[-border_thick:,:] = True
-    border_mask[:,:border_thick] = True
-    border_mask[:,-border_thick:] = True
+    border_mask = _border_mask(h, w, border_thick)
     border_pixels = crop[border_mask].reshape(-1,3)
     lab_bg_pixels = cv2.cvtColor(border_pixels.reshape(-1,1,3).astype(np.uint8), cv2.COLOR_RGB2LAB).reshape(-1,3)
     bg_mean = dominant_color(lab_bg_pixels)
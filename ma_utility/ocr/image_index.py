@@ -0,0 +1,108 @@
+import os
+import time
+import threading
+import numpy as np
+from ma_utility.text.normalize import normalize_word
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+
+
+class ImageNameIndex:
+    """
+    File names of an image folder with their normalized form and a
+    row-normalized embedding matrix, for get_target_image. The folder is only
+    re-listed when its mtime changes and only new names are embedded. A
+    query whose normalized text equals a file name skips the model, anything
+    else is one matmul against the matrix. Results are remembered until the
+    folder changes.
+    """
+    def __init__(self, path, embd_func, min_score=0.9):
+        self.path = path
+        self.embd_func = embd_func
+        self.min_score = min_score
+        self.files = []
+        self.names = []       # file names without extension
+        self.norm = {}        # {normalized name: row}, first file wins
+        self.matrix = np.zeros((0, 0), np.float32)
+        self.results = {}     # {query: file path or None}
+        self.stamp = None
+        self.settled = False
+        self.hits = self.misses = self.refreshes = self.embedded = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        # A change within the same mtime tick as the last listing would go unnoticed,
+        # so keep listing until the folder has been quiet for a second
+        if mtime == self.stamp and self.settled:
+            return
+        started = time.time_ns()
+        files = sorted(f for f in os.listdir(self.path) if f.lower().endswith(IMAGE_EXTS))
+        self.stamp = mtime
+        self.settled = started - mtime > 1_000_000_000
+        if files == self.files:
+            return
+
+        rows = dict(zip(self.files, self.matrix))
+        names = [os.path.splitext(f)[0] for f in files]
+        new = [(f, n) for f, n in zip(files, names) if f not in rows]
+        if new:
+            embs = np.asarray(self.embd_func([n for _, n in new]), dtype=np.float32)
+            embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+            rows.update(zip([f for f, _ in new], embs))
+            self.embedded += len(new)
+
+        self.files, self.names = files, names
+        self.matrix = np.stack([rows[f] for f in files]) if files else np.zeros((0, 0), np.float32)
+        self.norm = {}
+        for i, n in enumerate(names):
+            self.norm.setdefault(normalize_word(n), i)
+        self.results = {}
+        self.refreshes += 1
+
+    def lookup(self, ctx):
+        with self._lock:
+            self._refresh()
+            if ctx in self.results:
+                self.hits += 1
+                return self.results[ctx]
+            self.misses += 1
+
+            i = self.norm.get(normalize_word(ctx))
+            if i is None and self.files:
+                q = np.asarray(self.embd_func(ctx), dtype=np.float32).reshape(-1)
+                sims = self.matrix @ (q / np.linalg.norm(q))
+                i = int(np.argmax(sims))
+                if sims[i] < self.min_score:
+                    i = None
+            result = os.path.join(self.path, self.files[i]) if i is not None else None
+            if len(self.results) >= 4096:
+                self.results.clear()
+            self.results[ctx] = result
+            return result
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.files),
+            "bytes": self.matrix.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "embedded": self.embedded,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_indexes = {}  # {abs folder path: ImageNameIndex}
+def get_image_index(path, embd_func):
+    key = os.path.abspath(path)
+    index = _indexes.get(key)
+    # Bound methods are recreated on every attribute access, compare by equality
+    if index is None or index.embd_func != embd_func:
+        index = _indexes[key] = ImageNameIndex(path, embd_func)
+    return index
+
+def image_index_stats(path="./clickable_images"):
+    index = _indexes.get(os.path.abspath(path))
+    return index.stats() if index is not None else None
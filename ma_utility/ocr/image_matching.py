@@ -3,9 +3,8 @@ import numpy as np
 from PIL import Image
 import pyautogui
 import matplotlib.pyplot as plt   
-import os
-import os.path as osp
-from ma_utility.embeddings.similarity import cmp_txt_and_embs
+from ma_utility.ocr.template_cache import TemplateCache
+from ma_utility.ocr.image_index import get_image_index
 from core.logging import get_logger
 log = get_logger(__name__) 
 
@@ -18,15 +17,26 @@ def bbox_to_transformed(x, y, w, h):
         [ [x + w, y]     ]
     ])
 
-def SIFT_search(img, crop, min_match_count=4):
-    gray_img  = cv2.GaussianBlur(cv2.cvtColor(img,  cv2.COLOR_BGR2GRAY), (5,5), 0)
-    gray_crop = cv2.GaussianBlur(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), (5,5), 0)
+def gray_blur(img):
+    return cv2.GaussianBlur(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), (5,5), 0)
+
+# SIFT keypoint positions (n, 2) and descriptors (n, 128)
+def sift_features(gray):
+    kp, des = cv2.SIFT_create().detectAndCompute(gray, None)
+    pts = np.float32([k.pt for k in kp]).reshape(-1, 2)
+    return pts, des if des is not None else np.empty((0, 128), np.float32)
+
+def SIFT_search(img, crop, min_match_count=4, template=None):
+    # template: precomputed features of crop from template_features()
+    if template is not None:
+        gray_crop, pts1, des1 = template["gray"], template["pts"], template["des"]
+    else:
+        gray_crop = gray_blur(crop)
+        pts1, des1 = sift_features(gray_crop)
 
-    # SIFT features
     sift = cv2.SIFT_create()
-    kp1, des1 = sift.detectAndCompute(gray_crop, None)
-    kp2, des2 = sift.detectAndCompute(gray_img,  None)
-    if des1 is None or des2 is None:
+    kp2, des2 = sift.detectAndCompute(gray_blur(img), None)
+    if len(des1) == 0 or des2 is None:
         return None, None
 
     # FLANN matcher
@@ -42,7 +52,7 @@ def SIFT_search(img, crop, min_match_count=4):
     if len(good) < min_match_count:
         return None, None
 
-    src_pts = np.float32([kp1[m.queryIdx].pt for m in good]).reshape(-1,1,2)
+    src_pts = pts1[[m.queryIdx for m in good]].reshape(-1,1,2)
     dst_pts = np.float32([kp2[m.trainIdx].pt for m in good]).reshape(-1,1,2)
 
     # Homography
@@ -102,44 +112,66 @@ def projection_score(template_proj, matched_proj):
     m = matched_proj.flatten()
     return np.dot(t, m) / (np.linalg.norm(t) * np.linalg.norm(m) + 1e-8)
     
-def template_match(img, crop, max_scale_variation=1.25, thresh=0.75):
-    H, W = img.shape[:2]
+# Crop resized to every template_match scale, with the edge projections of each
+def scaled_templates(crop, max_scale_variation=1.25, n_scales=20):
     h0, w0 = crop.shape[:2]
+    templates, x_projs, y_projs = [], [], []
+    for s in np.linspace(1/max_scale_variation, max_scale_variation, n_scales):
+        w, h = int(w0*s), int(h0*s)
+        if w <= 0 or h <= 0:
+            continue
+        t_scaled = cv2.resize(crop, (w, h), interpolation=cv2.INTER_NEAREST)
+        x_proj, y_proj, _ = calculate_edges(t_scaled)
+        templates.append(t_scaled)
+        x_projs.append(x_proj)
+        y_projs.append(y_proj)
+    return templates, x_projs, y_projs
+
+# Largest power of two downsampling that keeps the smallest scaled template at least min_side px
+def coarse_factor(crop_shape, max_scale_variation=1.25, min_side=8, max_factor=8):
+    side = min(crop_shape[:2]) / max_scale_variation
+    f = 1
+    while f * 2 <= max_factor and side / (f * 2) >= min_side:
+        f *= 2
+    return f
+
+# Grayscale scaled templates downsampled by factor, for the coarse pass of template_match
+def coarse_templates(templates, factor):
+    return [cv2.cvtColor(cv2.resize(t, (max(1, t.shape[1] // factor), max(1, t.shape[0] // factor)),
+                                    interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            for t in templates]
+
+# Mean per channel CCOEFF_NORMED at the best location plus 0.1 * edge projection agreement there -> (score, loc)
+def _match_score(img, t_scaled, t_x_proj, t_y_proj):
+    h, w = t_scaled.shape[:2]
+    res = sum(cv2.matchTemplate(img[:,:,c], t_scaled[:,:,c], cv2.TM_CCOEFF_NORMED) for c in range(3)) / 3
+    _, score, _, loc = cv2.minMaxLoc(res)
+
+    x, y = loc
+    x_proj, y_proj, _ = calculate_edges(img[y:y+h, x:x+w])
+    proj_score = (projection_score(t_x_proj, x_proj) + projection_score(t_y_proj, y_proj)) / 2
+    return score + proj_score*0.1, loc
+
+def _pyramid(crop, max_scale_variation, template):
+    if template is not None and float(template["scale_variation"]) == max_scale_variation:
+        return template
+    templates, x_projs, y_projs = scaled_templates(crop, max_scale_variation)
+    f = coarse_factor(crop.shape, max_scale_variation)
+    return {"templates": templates, "x_projs": x_projs, "y_projs": y_projs,
+            "coarse_factor": f, "coarse": coarse_templates(templates, f)}
+
+# Reference implementation: exact score at every scale over the full screenshot
+def template_match_exhaustive(img, crop, max_scale_variation=1.25, thresh=0.75, template=None):
+    H, W = img.shape[:2]
     best_score = -1
     best_box = None
-    scales = np.linspace(1/max_scale_variation, max_scale_variation, 20)
+    p = _pyramid(crop, max_scale_variation, template)
 
-    for s in scales:
-        w, h = int(w0*s), int(h0*s)
-        if w <= 0 or h <= 0 or w > W or h > H:
+    for t_scaled, t_x_proj, t_y_proj in zip(p["templates"], p["x_projs"], p["y_projs"]):
+        h, w = t_scaled.shape[:2]
+        if w > W or h > H:
             continue
-
-        t_scaled = cv2.resize(crop, (w, h), interpolation=cv2.INTER_NEAREST)
-        res_b = cv2.matchTemplate(img[:,:,0], t_scaled[:,:,0], cv2.TM_CCOEFF_NORMED)
-        res_g = cv2.matchTemplate(img[:,:,1], t_scaled[:,:,1], cv2.TM_CCOEFF_NORMED)
-        res_r = cv2.matchTemplate(img[:,:,2], t_scaled[:,:,2], cv2.TM_CCOEFF_NORMED)
-        res = (res_b + res_g + res_r) / 3
-        _, score, _, loc = cv2.minMaxLoc(res)
-
-        x, y = loc
-        x_proj, y_proj, _ = calculate_edges(img[y:y+h, x:x+w])
-        res_x_proj, res_y_proj, _ = calculate_edges(t_scaled)
-        proj_score_x = projection_score(res_x_proj, x_proj)
-        proj_score_y = projection_score(res_y_proj, y_proj)
-
-        proj_score = (proj_score_x + proj_score_y) / 2
-        score += proj_score*0.1
-        """ if proj_score>0.8:
-            fig,axs=plt.subplots(1,2, figsize=(12,4))
-            axs[0].plot(x_proj)
-            axs[0].set_title("x_proj")
-            axs[1].plot(res_x_proj)
-            axs[1].set_title("res_x_proj")
-            for ax in axs:
-                ax.set_xlabel("index")
-                ax.set_ylabel("Mag")
-            plt.tight_layout()
-            plt.show()"""
+        score, loc = _match_score(img, t_scaled, t_x_proj, t_y_proj)
         if score > best_score:
             best_score = score
             best_box = (loc[0], loc[1], w, h)
@@ -151,6 +183,76 @@ def template_match(img, crop, max_scale_variation=1.25, thresh=0.75):
     transformed = bbox_to_transformed(x, y, w, h)
     return best_box, transformed
 
+def template_match(img, crop, max_scale_variation=1.25, thresh=0.75, template=None,
+                   top_k=4, peaks=2, coarse_step=2, pad=4):
+    H, W = img.shape[:2]
+    p = _pyramid(crop, max_scale_variation, template)
+    templates, f = p["templates"], int(p["coarse_factor"])
+
+    # Coarse pass: every `coarse_step`th scale on a downsampled grayscale screenshot,
+    # keeping the best `peaks` separated locations per scale
+    small = cv2.cvtColor(cv2.resize(img, (W // f, H // f), interpolation=cv2.INTER_AREA) if f > 1 else img,
+                         cv2.COLOR_BGR2GRAY)
+    candidates = []
+    for i in range(0, len(templates), coarse_step):
+        t_scaled, t_small = templates[i], p["coarse"][i]
+        h, w = t_small.shape[:2]
+        if t_scaled.shape[1] > W or t_scaled.shape[0] > H or w > small.shape[1] or h > small.shape[0]:
+            continue
+        res = cv2.matchTemplate(small, t_small, cv2.TM_CCOEFF_NORMED)
+        for _ in range(peaks):
+            _, score, _, (x, y) = cv2.minMaxLoc(res)
+            candidates.append((score, i, x, y))
+            res[max(0, y - h//2):y + h//2 + 1, max(0, x - w//2):x + w//2 + 1] = -1
+    candidates.sort(reverse=True)
+
+    # Fine pass: exact score in a small full resolution window around the top candidates,
+    # at their scale and the skipped ones next to it
+    best_score = -1
+    best_box = None
+    seen = set()
+    m = f + pad
+    for _, i, x, y in candidates[:top_k]:
+        for j in range(i - coarse_step + 1, i + coarse_step):
+            if not 0 <= j < len(templates) or (j, x, y) in seen:
+                continue
+            seen.add((j, x, y))
+            h, w = templates[j].shape[:2]
+            x0, y0 = max(0, x*f - m), max(0, y*f - m)
+            x1, y1 = min(W, x*f + w + m), min(H, y*f + h + m)
+            if x1 - x0 < w or y1 - y0 < h:
+                continue
+            score, (lx, ly) = _match_score(img[y0:y1, x0:x1], templates[j], p["x_projs"][j], p["y_projs"][j])
+            if score > best_score:
+                best_score = score
+                best_box = (x0 + lx, y0 + ly, w, h)
+
+    if best_score < thresh or best_box is None:
+        return None, None
+
+    x, y, w, h = best_box
+    transformed = bbox_to_transformed(x, y, w, h)
+    return best_box, transformed
+
+
+
+# Everything find_crop_in_image needs from a template image, see TemplateCache
+def template_features(path):
+    crop = cv2.cvtColor(np.array(Image.open(path).convert("RGB")), cv2.COLOR_RGB2BGR)
+    gray = gray_blur(crop)
+    pts, des = sift_features(gray)
+    templates, x_projs, y_projs = scaled_templates(crop)
+    f = coarse_factor(crop.shape)
+    return {
+        "image": crop, "gray": gray, "pts": pts, "des": des,
+        "scale_variation": np.float64(1.25), "templates": templates, "x_projs": x_projs, "y_projs": y_projs,
+        "coarse_factor": np.int64(f), "coarse": coarse_templates(templates, f),
+    }
+
+template_cache = TemplateCache(template_features, version=2)
+
+def template_cache_stats():
+    return template_cache.stats()
 
 
 def find_crop_in_image(screenshot, crop_path, min_match_count=4, return_new_img=True, offset=None):
@@ -160,17 +262,13 @@ def find_crop_in_image(screenshot, crop_path, min_match_count=4, return_new_img=
         log.debug("Wrong image format")
         return None, None
 
-    crop = Image.open(crop_path).convert("RGB")
-    img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    crop = cv2.cvtColor(np.array(crop), cv2.COLOR_RGB2BGR)
-
-    if img is None or crop is None:
-        raise FileNotFoundError("Could not read one of the images")
+    template = template_cache.get(crop_path)
+    crop = template["image"]
 
-    bbox, transformed = SIFT_search(img, crop, min_match_count)
+    bbox, transformed = SIFT_search(img, crop, min_match_count, template=template)
     if bbox == None:
         log.debug("Running multiscale")
-        bbox, transformed = template_match(img, crop)
+        bbox, transformed = template_match(img, crop, template=template)
 
     if offset is not None and bbox is not None:
         ox, oy = offset
@@ -186,15 +284,7 @@ def find_crop_in_image(screenshot, crop_path, min_match_count=4, return_new_img=
 
 
 def get_target_image(embd_func, ctx, path="./clickable_images"):
-    image_files = [f for f in os.listdir(path)
-                   if f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"))]
-    base = [osp.splitext(f)[0] for f in image_files]
-    base_embs = embd_func(base)
-    best = cmp_txt_and_embs(ctx, zip(base_embs, base), embd_func)
-    if not best:
-        return None
-    return osp.join(path, image_files[base.index(best["text"])])
-
+    return get_image_index(path, embd_func).lookup(ctx)
 
 
 if __name__ == "__main__":
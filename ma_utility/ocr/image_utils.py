@@ -9,6 +9,12 @@ def base64_to_crop(b64_str):
     crop_array = np.array(pil_img)
     return crop_array
 
+# OCR items carry either a base64 PNG crop (line layout) or a view sliced from the screenshot (columnar layout)
+def as_crop(crop):
+    if crop is None or isinstance(crop, np.ndarray):
+        return crop
+    return base64_to_crop(crop)
+
 def image_hash(img: Image.Image) -> str:
     return hashlib.md5(img.tobytes()).hexdigest()
 
@@ -4,7 +4,8 @@ log = get_logger(__name__)
 
 
 
-_emb_cache = {}  # key: text + str(box), value: embedding
+# Embeddings of repeated labels come from the client's embedding store (AccessModels.embd_func),
+# one call per frame for all texts
 def embd_ocr_lines(embd_func, preds):
     embd_lines = []
     to_encode, idxs = [], []
@@ -14,26 +15,21 @@ def embd_ocr_lines(embd_func, preds):
         return None
 
     for line in preds:
-        if line is None or len(line) == 0 or len(line[0]) != 3: 
+        # (box, text, crop) or (box, text, crop, attrs) with host side attributes (color, color_name)
+        if line is None or len(line) == 0 or len(line[0]) not in (3, 4): 
             log.debug("embd_ocr_lines() => received wrong preds structure")
             continue
 
         entries = [None] * len(line)
-        for i, (box, text, crop) in enumerate(line):
-            key = text + "_" + "_".join(f"{b:.2f}" for b in box)
-
-            if key in _emb_cache:
-                entries[i] = {"bbox": box, "text": text, "embedding": _emb_cache[key], "crop": crop}
-            else:
-                to_encode.append(text)
-                idxs.append((entries, i, key, box, text, crop))
+        for i, (box, text, crop, *attrs) in enumerate(line):
+            to_encode.append(text)
+            idxs.append((entries, i, box, text, crop, attrs[0] if attrs else {}))
         lines_structure.append(entries)
 
     if to_encode:
         embeddings = embd_func(to_encode)
-        for (entries, i, key, box, text, crop), emb in zip(idxs, embeddings):
-            _emb_cache[key] = emb
-            entries[i] = {"bbox": list(box), "text": text, "embedding": emb, "crop": crop}
+        for (entries, i, box, text, crop, attrs), emb in zip(idxs, embeddings):
+            entries[i] = {"bbox": list(box), "text": text, "embedding": emb, "crop": crop, **attrs}
 
     for entries in lines_structure:
         embd_lines.append([e for e in entries if e is not None])
@@ -49,11 +45,11 @@ def filter_numbers(preds):
 
     for line in preds:
         new_line = []
-        if line is not None and len(line) > 0 and len(line[0]) != 3: 
+        if line is not None and len(line) > 0 and len(line[0]) not in (3, 4): 
             log.debug("filter_numbers(preds) => received wrong preds structure")
             continue
 
-        for bbox, text, color in line:
+        for bbox, text, color, *attrs in line:
             x, y, w, h = bbox
             text = text.strip()
             if not text:
@@ -71,7 +67,7 @@ def filter_numbers(preds):
                 sub_x = x + start * char_len
                 sub_w = num_len * char_len
                 sub_bbox = (sub_x, y, sub_w, h)
-                new_line.append((sub_bbox, text, color))
+                new_line.append((sub_bbox, text, color, *attrs))
 
         if new_line:
             filtered.append(new_line)
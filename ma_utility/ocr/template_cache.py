@@ -0,0 +1,89 @@
+import os
+import numpy as np
+from core.cache import ByteLRU, atomic_write
+from core.logging import get_logger
+log = get_logger(__name__)
+
+
+class TemplateCache:
+    """
+    Features of template images on disk, computed once per file version.
+    `build(path)` returns a dict of arrays (or lists of arrays); the result is
+    kept in a byte-budgeted LRU and persisted to a compressed .npz sidecar in
+    a `.features` folder next to the image. Entries are keyed by the file's
+    mtime and size, so an edited or replaced image is rebuilt on next use.
+    Bump `version` when `build` changes to drop old sidecars.
+    """
+    def __init__(self, build, version=1, max_bytes=64 * 1024 * 1024, sidecar_dir=".features"):
+        self.build = build
+        self.version = version
+        self.sidecar_dir = sidecar_dir
+        self.lru = ByteLRU(max_bytes, min_entries=1)  # {(abs path, stamp): features}, old versions age out
+        self.loads = self.builds = 0
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def sidecar(self, path):
+        folder, name = os.path.split(path)
+        return os.path.join(folder, self.sidecar_dir, name + ".npz")
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        stamp = self._stamp(path)
+        feats = self.lru.get((path, stamp))
+        if feats is not None:
+            return feats
+
+        feats = self._load(path, stamp)
+        if feats is None:
+            feats = self.build(path)
+            self.builds += 1
+            self._save(path, stamp, feats)
+        else:
+            self.loads += 1
+        nbytes = sum(sum(a.nbytes for a in v) if isinstance(v, list) else v.nbytes for v in feats.values())
+        self.lru.put((path, stamp), feats, nbytes)
+        return feats
+
+    def stats(self):
+        return self.lru.stats(sidecar_loads=self.loads, builds=self.builds)
+
+    # ---------- persistence ----------
+
+    # Lists are flattened to "name/0", "name/1", ... and a "name/n" count
+    def _save(self, path, stamp, feats):
+        arrays = {"_version": np.int64(self.version), "_stamp": np.array(stamp, np.int64)}
+        for k, v in feats.items():
+            if isinstance(v, list):
+                arrays[f"{k}/n"] = np.int64(len(v))
+                arrays.update((f"{k}/{i}", a) for i, a in enumerate(v))
+            else:
+                arrays[k] = v
+
+        out = self.sidecar(path)
+        try:
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            atomic_write(out, lambda f: np.savez_compressed(f, **arrays))
+        except OSError as e:
+            log.debug(f"Could not write template sidecar {out}: {e}")
+
+    def _load(self, path, stamp):
+        sidecar = self.sidecar(path)
+        if not os.path.exists(sidecar):
+            return None
+        try:
+            with np.load(sidecar) as data:
+                if int(data["_version"]) != self.version or tuple(data["_stamp"]) != stamp:
+                    return None
+                arrays = {k: data[k] for k in data.files if not k.startswith("_")}
+        except (OSError, ValueError, KeyError) as e:
+            log.debug(f"Ignoring unreadable template sidecar {sidecar}: {e}")
+            return None
+
+        feats = {}
+        for k in [k for k in arrays if "/" not in k] + [k[:-2] for k in arrays if k.endswith("/n")]:
+            feats[k] = [arrays[f"{k}/{i}"] for i in range(int(arrays[f"{k}/n"]))] if f"{k}/n" in arrays else arrays[k]
+        return feats
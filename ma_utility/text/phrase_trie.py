@@ -0,0 +1,25 @@
+class PhraseTrie:
+    """Word-level prefix trie of phrases. The first value added for a phrase wins."""
+    def __init__(self, phrases=()):
+        self.root = {}
+        for phrase, value in phrases:
+            self.add(phrase, value)
+
+    def add(self, phrase, value):
+        node = self.root
+        for tok in phrase.lower().split():
+            node = node.setdefault(tok, {})
+        node.setdefault(None, value)
+
+    # Longest phrase found anywhere in tokens, leftmost among equally long ones -> (start, length, value)
+    def longest_match(self, tokens, max_n=None):
+        best = None
+        for start in range(len(tokens)):
+            node = self.root
+            for n, tok in enumerate(tokens[start:start + (max_n or len(tokens))], 1):
+                node = node.get(tok)
+                if node is None:
+                    break
+                if None in node and (best is None or n > best[1]):
+                    best = (start, n, node[None])
+        return best
@@ -1,124 +1,293 @@
 from PIL import Image
 import numpy as np
 from concurrent.futures import ThreadPoolExecutor
-from hezar.models import Model
-from paddleocr import PaddleOCR
 import matplotlib.pyplot as plt, matplotlib.patches as patches
 from sklearn.cluster import DBSCAN
 import hashlib
 import time
+import threading
 import cv2
-from collections import deque
 import warnings, os, sys
+import tracemalloc
 
 
 sys.path.append(".")
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from models.OCR.box_condense import condense_boxes
+from models.OCR.rec_cache import RecognitionCache
 
 import matplotlib.pyplot as plt
 import numpy as np
 
 
-class OCR:
-    def __init__(self, conf=0.6, tile_h=800, tile_w=800, tile_overlap=30, downscale=1.0, upscale=1.0, max_workers=4, box_condense=(4,0)):
-        self.craft = Model.load("hezarai/CRAFT", device="cuda", link_threshold=0.4)
-        self.ocr = PaddleOCR(
+# ---- Detector / recognizer backends ----
+# Detector: tile (PIL.Image) -> [(x,y,w,h), ...] in tile coords,
+#   optional .batch(tiles, tile_h, tile_w) -> one box list per tile
+# Recognizer: [crop np.ndarray, ...] -> [(text, conf), ...] in input order
+
+class CraftDetector:
+    def __init__(self, device="cuda", batch_size=2, **_):
+        from hezar.models import Model
+        self.model = Model.load("hezarai/CRAFT", device=device, link_threshold=0.4)
+        self.batch_size = batch_size
+
+    def __call__(self, tile):
+        return self.model.predict(tile)[0]["boxes"]
+
+    def batch(self, tiles, tile_h, tile_w):
+        # Edge tiles are zero padded to the full tile size so a chunk stacks into one forward pass
+        padded = []
+        for tile in tiles:
+            h, w = tile.shape[:2]
+            if (h, w) != (tile_h, tile_w):
+                tile = np.pad(tile, ((0, tile_h - h), (0, tile_w - w), (0, 0)))
+            padded.append(tile)
+
+        out = []
+        for i in range(0, len(padded), self.batch_size):
+            out.extend(pred["boxes"] for pred in self.model.predict(padded[i:i + self.batch_size]))
+        return out
+
+
+class PaddleDBDetector:
+    def __init__(self, device="cuda", model_dir="./models/OCR/ch_PP-OCRv4_det", **_):
+        from paddleocr import PaddleOCR
+        self.model = PaddleOCR(
+            lang='ch',
+            use_angle_cls=False,
+            use_gpu=device != "cpu",
+            det_model_dir=model_dir,
+            rec_model_dir="./models/OCR/ch_PP-OCRv4_rec",
+            det_db_box_type="quad",
+            show_log=False
+        )
+
+    def __call__(self, tile):
+        # paddle expects BGR
+        img = cv2.cvtColor(np.asarray(tile), cv2.COLOR_RGB2BGR)
+        quads, _ = self.model.text_detector(img)
+        if quads is None:
+            return []
+        out = []
+        for quad in quads:
+            x0, y0 = quad.min(axis=0)
+            x1, y1 = quad.max(axis=0)
+            out.append((float(x0), float(y0), float(x1 - x0), float(y1 - y0)))
+        return out
+
+
+class PaddleRecognizer:
+    def __init__(self, device="cuda", model_dir="./models/OCR/ch_PP-OCRv3_rec_small", batch=64, **_):
+        from paddleocr import PaddleOCR
+        self.model = PaddleOCR(
             lang='en', 
             rec_char_type='en',
             use_angle_cls=False, 
             use_textline_orientation=False,
-            rec_model_dir='./models/OCR/ch_PP-OCRv3_rec_small',
+            use_gpu=device != "cpu",
+            rec_model_dir=model_dir,
             rec_algorithm='CRNN',
+            rec_batch_num=batch,
             det_db_box_type="quad"
         )
+
+    def __call__(self, crops):
+        rec_res, _ = self.model.text_recognizer(crops)
+        return rec_res
+
+
+DETECTORS = {
+    "craft": CraftDetector,
+    "paddle_db": PaddleDBDetector,
+}
+RECOGNIZERS = {
+    "ppocr_v3_small": PaddleRecognizer,
+    "ppocr_v4": lambda **kw: PaddleRecognizer(model_dir="./models/OCR/ch_PP-OCRv4_rec", **kw),
+}
+
+
+class OCR:
+    def __init__(self, conf=0.6, tile_h=800, tile_w=800, tile_overlap=30, downscale=1.0, upscale=1.0, max_workers=4, box_condense=(4,0), incremental=False, rec_batch=64,
+                 rec_cache_bytes=32*1024*1024, rec_cache_path=None, detector="craft", recognizer="ppocr_v3_small", device="cuda", det_batch=2,
+                 blank_thresh=0.0, adaptive_upscale=False, min_text_px=24, track_alloc=False, color_func=None):
+        self.detector = DETECTORS[detector](device=device, batch_size=det_batch)
+        self.recognizer = RECOGNIZERS[recognizer](device=device, batch=rec_batch)
         self.CONF_THRESH = conf
         self.downscale = downscale
         self.upscale = upscale
-        self.max_workers = max_workers
+        self.max_workers = max(1, min(max_workers, os.cpu_count() or 1))
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ocr")
         self.box_condense = box_condense
         self.tile_h = tile_h
         self.tile_w = tile_w
         self.tile_overlap = tile_overlap
-        self.box_cache = {}  # {box_id: (last_hash, last_text)}
+        self.rec_bucket = 4  # width/height ratio bucket size for batched recognition
+        self.box_cache = RecognitionCache(max_bytes=rec_cache_bytes, path=rec_cache_path)  # {crop_hash: (text, conf, color)}
+        self.incremental = incremental
+        self.tile_cache = {}  # {(l,t,r,b): (tile_hash, boxes)} of the previous frame
+        self.frame_size = None
+        self._tile_lock = threading.Lock()
+        self.blank_thresh = blank_thresh  # min edge density for a tile to be detected, 0 disables the skip
+        self.blank_downscale = 2  # in native pixels, the texture pass runs at 1/2 of the unscaled screen
+        self.frame_scale = 1.0
+        self.tile_ms = None  # running average of detection time per tile
+        self.call_stats = {}
+        self.adaptive_upscale = adaptive_upscale  # detect at native size, upscale only small crops for recognition
+        self.min_text_px = min_text_px
+        self.track_alloc = track_alloc  # report per-call numpy/python allocation peak via tracemalloc
+        self.color_func = color_func  # crops -> [(r, g, b, name) | None], runs next to recognition, cached with it
         
 
     def _hash_crop(self, crop: np.ndarray):
         return hashlib.md5(crop.tobytes()).hexdigest()
 
-    def _process_tile(self, screenshot, left, top, right, bottom):
-        tile = screenshot.crop((left, top, right, bottom))
-        boxes = self.craft.predict(tile)[0]["boxes"]
+    def _filter_tile_boxes(self, boxes, left, top, right, bottom):
         tile_w, tile_h = right-left, bottom-top
         edge = 3
         out = []
         for x,y,w,h in boxes:
             l,t,r,b = x,y,x+w,y+h
-            if (t<=edge or b>=tile_h-edge):
+            if (t<=edge or b>=tile_h-edge or l>=tile_w):
                 continue
             out.append((int(l+left), int(t+top), int(w), int(h)))
         return out
 
+    def _process_tile(self, frame, left, top, right, bottom):
+        tile = Image.fromarray(frame[top:bottom, left:right])
+        return self._filter_tile_boxes(self.detector(tile), left, top, right, bottom)
+
+    def _textured_tiles(self, frame, tiles):
+        # Edge density per tile on a downscaled gray frame, flat panels/backgrounds score ~0
+        if self.blank_thresh <= 0:
+            return [True] * len(tiles)
+        f = max(1, int(round(self.blank_downscale * self.frame_scale)))
+        H, W = frame.shape[:2]
+        # ceil division, so a tile starting in the last f pixels still maps inside the small frame
+        small = cv2.resize(frame, (-(-W // f), -(-H // f)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY).astype(np.int16)
+
+        edges = np.zeros(gray.shape, np.uint8)
+        edges[:, 1:] |= np.abs(np.diff(gray, axis=1)) > 24
+        edges[1:, :] |= np.abs(np.diff(gray, axis=0)) > 24
+        integral = cv2.integral(edges)
+
+        keep = []
+        for l, t, r, b in tiles:
+            l, t = l // f, t // f
+            r, b = max(l + 1, r // f), max(t + 1, b // f)
+            count = integral[b, r] - integral[t, r] - integral[b, l] + integral[t, l]
+            keep.append(bool(count / ((r - l) * (b - t)) >= self.blank_thresh))
+        return keep
+
+    def _detect_batch(self, frame, tiles):
+        if not tiles:
+            return []
+        keep = self._textured_tiles(frame, tiles)
+        todo = [tile for tile, k in zip(tiles, keep) if k]
+
+        start = time.perf_counter()
+        if not todo:
+            found = []
+        elif hasattr(self.detector, "batch"):
+            raw = self.detector.batch([frame[t:b, l:r] for l, t, r, b in todo], self.tile_h, self.tile_w)
+            found = [self._filter_tile_boxes(boxes, *tile) for boxes, tile in zip(raw, todo)]
+        else:
+            found = list(self.pool.map(lambda args: self._process_tile(frame, *args), todo))
+
+        # Saved time is estimated from the running per-tile detection cost
+        if todo:
+            ms = (time.perf_counter() - start) * 1000 / len(todo)
+            self.tile_ms = ms if self.tile_ms is None else 0.9 * self.tile_ms + 0.1 * ms
+        skipped = len(tiles) - len(todo)
+        self.call_stats["tiles_detected"] += len(todo)
+        self.call_stats["tiles_skipped"] += skipped
+        self.call_stats["skip_saved_ms"] += skipped * (self.tile_ms or 0.0)
+
+        found = iter(found)
+        return [next(found) if k else [] for k in keep]
+
+    def _detect_tiles(self, frame, tiles):
+        # Full detection on every tile
+        if not self.incremental:
+            return self._detect_batch(frame, tiles)
+
+        # Incremental: only re-detect tiles whose pixels changed since last frame.
+        # Endpoints run concurrently, so the shared cache is only touched under the lock
+        # and the result is built from what this call read and detected
+        hashes = list(self.pool.map(lambda tile: self._hash_crop(frame[tile[1]:tile[3], tile[0]:tile[2]]), tiles))
+        with self._tile_lock:
+            if self.frame_size != frame.shape:
+                self.tile_cache = {}
+                self.frame_size = frame.shape
+            prev = [self.tile_cache.get(tile, (None, None)) for tile in tiles]
+        dirty = [i for i, (hsh, (old, _)) in enumerate(zip(hashes, prev)) if old != hsh]
+
+        fresh = self._detect_batch(frame, [tiles[i] for i in dirty])
+        out = [boxes for _, boxes in prev]
+        for i, boxes in zip(dirty, fresh):
+            out[i] = boxes
+        with self._tile_lock:
+            if self.frame_size == frame.shape:
+                for i in dirty:
+                    self.tile_cache[tiles[i]] = (hashes[i], out[i])
+        self.call_stats["tiles_cached"] = len(tiles) - len(dirty)
+        return out
+
+    def _rec_input(self, crop):
+        # Adaptive mode: enlarge only crops whose line height is below min_text_px
+        h, w = crop.shape[:2]
+        if not self.adaptive_upscale or h >= self.min_text_px:
+            return crop
+        f = min(self.upscale, self.min_text_px / max(h, 1))
+        if f <= 1.0:
+            return crop
+        return cv2.resize(crop, (int(w * f), int(h * f)), interpolation=cv2.INTER_CUBIC)
+
+    def _recognize_batch(self, crops):
+        # Group crops by aspect ratio so padding inside a batch stays small,
+        # paddle recognizer resizes to a fixed height and pads width to the batch max
+        buckets = {}
+        for i, crop in enumerate(crops):
+            h, w = crop.shape[:2]
+            buckets.setdefault(int(w / max(h, 1)) // self.rec_bucket, []).append(i)
+
+        results = [("", 0.0)] * len(crops)
+        for idxs in buckets.values():
+            rec_res = self.recognizer([crops[i] for i in idxs])
+            for i, (text, conf) in zip(idxs, rec_res):
+                results[i] = (text.strip(), conf)
+        return results
+
 
    
     def _condense_boxes(self, boxes, scale, x_limit_px=300):
-        if not boxes:
-            return []
-
         x_tol = self.box_condense[0] * scale
         y_tol = self.box_condense[1] * scale
-        boxes = deque([tuple(b) for b in boxes])
-        results = {b: True for b in boxes}
-
-        while boxes:
-            box0 = boxes.popleft()
-            l0, t0, r0, b0 = box0[0], box0[1], box0[0]+box0[2], box0[1]+box0[3]
-
-            for box1 in list(boxes):
-                if not results.get(box1, True):
-                    continue
-                l1, t1, r1, b1 = box1[0], box1[1], box1[0]+box1[2], box1[1]+box1[3]
-                h0, h1 = box0[3], box1[3]
-
-                x_pass = not (r1 < l0 - x_tol or r0 < l1 - x_tol)
-                y_pass = abs(t1 - t0) <= y_tol and abs(h1 - h0) < min(h0, h1) * 0.5
-
-                if x_pass and y_pass:
-                    nl, nr = min(l0, l1), max(r0, r1)
-                    nt, nb = min(t0, t1), max(b0, b1)
-                    if nr - nl >= x_limit_px:
-                        continue  # box too long
-                    new_box = (nl, nt, nr - nl, nb - nt)
-
-                    # Keep original boxes, just add the merged one
-                    results[new_box] = True
-                    boxes.remove(box1)
-                    boxes.append(new_box)
-                    break
-
-        return [b for b, keep in results.items() if keep]
+        return condense_boxes(boxes, x_tol, y_tol, x_limit_px)
                     
 
-    def split_text_vertically(self, crop, threshold=0.35, proj_noise=0.05,
-                            edge_pad=2, visualize=False, target_px=200):
-
+    def _split_upscale(self, crop, target_px):
         h, w = crop.shape[:2]
-
         scale = max(target_px / min(h, w), 1.0)
-        min_height = max(8, int(h * 0.05 * scale))
-
-       # Resize and blur
         new_w, new_h = int(w * scale), int(h * scale)
         up = cv2.resize(crop, (new_w, new_h), interpolation=cv2.INTER_LANCZOS4)
+        return up, scale
+
+    def _split_edges(self, up):
+        # Sharpen, smooth and return gradient magnitude of an upscaled crop (or a stack of them)
         blur = cv2.GaussianBlur(up, (15,15), sigmaX=35.0)
         up = cv2.addWeighted(up, 1.6, blur, -.5, 0)
         crop_up = cv2.bilateralFilter(up, d=1, sigmaColor=50, sigmaSpace=50)
 
-        # Compute gradient mag
         gray = cv2.cvtColor(crop_up, cv2.COLOR_RGB2GRAY)
         gx = cv2.Scharr(gray, cv2.CV_32F, 1, 0)
         gy = cv2.Scharr(gray, cv2.CV_32F, 0, 1)
-        mag = cv2.magnitude(gx, gy)
-        mag /= mag.max() + 1e-6
+        return cv2.magnitude(gx, gy)
+
+    def _split_segments(self, mag, h, w, scale, threshold, proj_noise, edge_pad):
+        new_h = mag.shape[0]
+        min_height = max(8, int(h * 0.05 * scale))
+        mag = mag / (mag.max() + 1e-6)
         edges = mag > threshold
 
         proj = edges.sum(axis=1)
@@ -144,6 +313,14 @@ class OCR:
             if ho <= 1 or yo < 0 or yo + ho > h:
                 continue
             boxes.append((0, yo, w, ho))
+        return boxes
+
+    def split_text_vertically(self, crop, threshold=0.35, proj_noise=0.05,
+                            edge_pad=2, visualize=False, target_px=200):
+
+        h, w = crop.shape[:2]
+        up, scale = self._split_upscale(crop, target_px)
+        boxes = self._split_segments(self._split_edges(up), h, w, scale, threshold, proj_noise, edge_pad)
 
         if visualize and boxes:
             plt.imshow(crop)
@@ -153,72 +330,169 @@ class OCR:
 
         return boxes
 
+    def split_text_vertically_batch(self, crops, threshold=0.35, proj_noise=0.05,
+                                    edge_pad=2, target_px=200):
+        # Same result as split_text_vertically per crop, but the filters run once on a
+        # vertical stack. Each crop gets a reflected border wider than the filter reach
+        # (blur radius 7 + Scharr 1), so its own pixels see the same neighbourhood
+        # as when filtered alone.
+        if not crops:
+            return []
+        border = 10
+        ups = [self._split_upscale(crop, target_px) for crop in crops]
+        padded = [cv2.copyMakeBorder(up, border, border, border, border, cv2.BORDER_REFLECT_101)
+                  for up, _ in ups]
+        canvas = np.zeros((sum(p.shape[0] for p in padded), max(p.shape[1] for p in padded), 3), np.uint8)
+        y = 0
+        for p in padded:
+            canvas[y:y + p.shape[0], :p.shape[1]] = p
+            y += p.shape[0]
+
+        mag = self._split_edges(canvas)
+
+        out, y = [], 0
+        for crop, (up, scale), p in zip(crops, ups, padded):
+            uh, uw = up.shape[:2]
+            region = mag[y + border:y + border + uh, border:border + uw]
+            out.append(self._split_segments(region, *crop.shape[:2], scale, threshold, proj_noise, edge_pad))
+            y += p.shape[0]
+        return out
 
-    def __call__(self, screenshot: Image):
-        W, H = screenshot.size 
-        scale = 1 / self.downscale if self.downscale != 1.0 else self.upscale if self.upscale > 1.0 else 1.0
-        screenshot = screenshot.resize((int(W*scale), int(H*scale)), Image.BILINEAR)
-        W, H = screenshot.size 
+    def _is_multiline(self, crop, min_line_px=6, gap_noise=0.05):
+        # Cheap native scale check: does the row ink profile have two or more separated runs
+        h = crop.shape[0]
+        if h < 2 * min_line_px * self.frame_scale:
+            return False
+        gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY).astype(np.int16)
+        proj = np.abs(np.diff(gray, axis=1)).sum(axis=1)
+        if proj.max() <= 0:
+            return False
+        ink = (proj > proj.max() * gap_noise).astype(np.int8)
+        runs = np.count_nonzero(np.diff(np.pad(ink, (1, 1))) == 1)
+        return runs >= 2
+
+
+    def detect(self, screenshot):
+        # screenshot: PIL image or RGB uint8 array (used without copying when no scaling is needed).
+        # Returns the scaled frame as a numpy array, the scale and condensed boxes in scaled coords
+        is_array = isinstance(screenshot, np.ndarray)
+        H, W = screenshot.shape[:2] if is_array else screenshot.size[::-1]
+        scale = nominal = 1 / self.downscale if self.downscale != 1.0 else self.upscale if self.upscale > 1.0 else 1.0
+        if self.adaptive_upscale and scale > 1.0:
+            scale = 1.0
+        if scale != 1.0 and is_array:
+            screenshot = cv2.resize(screenshot, (int(W*scale), int(H*scale)), interpolation=cv2.INTER_LINEAR)
+        elif scale != 1.0:
+            screenshot = screenshot.resize((int(W*scale), int(H*scale)), Image.BILINEAR)
+        self.frame_scale = scale
+        # the only full-frame copy for PIL input, tiles and crops are views into it
+        frame = screenshot if is_array else np.asarray(screenshot)
+        H, W = frame.shape[:2]
 
         all_boxes = [] 
         tiles = [
             (left, top, min(left + self.tile_w, W), min(top + self.tile_h, H))
             for top in range(0, H, max(1, self.tile_h - self.tile_overlap))
             for left in range(0, W, max(1, self.tile_w - self.tile_overlap))]
-        with ThreadPoolExecutor(max_workers=self.max_workers) as exe: 
-            results = exe.map(lambda args: self._process_tile(screenshot, *args), tiles)
+        self.call_stats = {"tiles": len(tiles), "tiles_detected": 0, "tiles_skipped": 0, "tiles_cached": 0, "skip_saved_ms": 0.0}
+        results = self._detect_tiles(frame, tiles)
         
         for res in results: 
             all_boxes.extend(res) # [x,y,w,h]
 
-        boxes = self._condense_boxes(all_boxes, scale)
+        # The merge cap is tuned in pixels of the configured scale, adaptive mode detects below it
+        return frame, scale, self._condense_boxes(all_boxes, scale, 300 * scale / nominal)
+
+    @staticmethod
+    def _crop(frame, x, y, w, h):
+        # numpy view of the box, clipped to the frame
+        H, W = frame.shape[:2]
+        return frame[max(0, int(y)):min(H, int(y+h)), max(0, int(x)):min(W, int(x+w))]
+
+
+    # Lines of (box, text, crop), followed by conf with return_conf and color with return_color
+    def __call__(self, screenshot, return_conf=False, return_color=False):
+        if not self.track_alloc:
+            return self._run(screenshot, return_conf, return_color)
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        try:
+            return self._run(screenshot, return_conf, return_color)
+        finally:
+            after, peak = tracemalloc.get_traced_memory()
+            self.call_stats["alloc_peak_mb"] = (peak - before) / 2**20
+            self.call_stats["alloc_retained_mb"] = (after - before) / 2**20
+
+    def _run(self, screenshot, return_conf=False, return_color=False):
+        frame, scale, boxes = self.detect(screenshot)
         final_boxes = []
 
         # ---- Vertical line splitting ----
+        # single line boxes are kept as detected, only multi-line candidates get split
+        candidates = []
         for x, y, w, h in boxes:
             if w <= 1 or h <= 1: continue
             r, b = int(x+w), int(y+h)
             if r <= int(x) or b <= int(y): continue
 
-            crop = np.array(screenshot.crop((int(x), int(y), r, b)))
-            sub_boxes = self.split_text_vertically(crop, visualize=False)
+            crop = self._crop(frame, x, y, w, h)
+            if self._is_multiline(crop):
+                candidates.append(((x, y, w, h), crop))
+            else:
+                final_boxes.append((x, y, w, h))
+
+        split = self.split_text_vertically_batch([crop for _, crop in candidates])
+        for ((x, y, w, h), _), sub_boxes in zip(candidates, split):
             if not sub_boxes:
                 final_boxes.append((x, y, w, h))
                 continue
             for x0, y0, w0, h0 in sub_boxes:
                 final_boxes.append((x + x0, y + y0, w0, h0))
-        crops = [np.array(screenshot.crop((int(x), int(y), int(x+w), int(y+h)))) 
-                for x, y, w, h in final_boxes]
+        crops = [self._crop(frame, *box) for box in final_boxes]
+        final_boxes, crops = [b for b, c in zip(final_boxes, crops) if c.size], [c for c in crops if c.size]
 
         # ---- Processing crops ----
-        def process_crop(args):
-            box, crop = args
-            hsh = self._hash_crop(crop)
-            if hsh in self.box_cache:
-                return self.box_cache[hsh]
-            
-            result = self.ocr.ocr(crop, det=False, cls=False)
-            if not result or not result[0] or not result[0][0]:
-                return "", crop
-            text, conf = result[0][0][0].strip(), result[0][0][1]
-
-            if conf < self.CONF_THRESH:
-                text = ""
-
-            self.box_cache[hsh] = (text, crop)
-            return text, crop
-
-        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
-            processed_crops = list(ex.map(process_crop, zip(final_boxes, crops)))
+        keys = list(self.pool.map(self.box_cache.key, crops))
+        cached = [self.box_cache.get(key) for key in keys]
+        pending = {}  # {key: crop} not in cache, deduplicated
+        need_color = {}  # {key: crop} without a cached color
+        known = {key: hit for key, hit in zip(keys, cached) if hit is not None}
+        for key, crop, hit in zip(keys, crops, cached):
+            if hit is None:
+                pending.setdefault(key, crop)
+            if self.color_func is not None and (hit is None or hit[2] is None):
+                need_color.setdefault(key, crop)
+
+        # Text colors are estimated on the pool while the recognizer runs
+        color_job = self.pool.submit(self.color_func, list(need_color.values())) if need_color else None
+
+        rec_res = {}
+        if pending:
+            rec_crops = [self._rec_input(crop) for crop in pending.values()]
+            rec_res = {key: (text, conf, None) for key, (text, conf) in zip(pending, self._recognize_batch(rec_crops))}
+        if color_job is not None:
+            for key, color in zip(need_color, color_job.result()):
+                text, conf, _ = rec_res.get(key) or known[key]
+                rec_res[key] = (text, conf, color)
+        for key, (text, conf, color) in rec_res.items():
+            self.box_cache.put(key, text, conf, color)
+        if rec_res:
+            cached = [rec_res.get(key, hit) for key, hit in zip(keys, cached)]
+
+        processed_crops = [(text if conf >= self.CONF_THRESH else "", conf, color, crop)
+                           for (text, conf, color), crop in zip(cached, crops)]
 
         # ---- post-process filtering ----
-        filtered = [(box, text, crop)
-                    for box, (text, crop) in zip(final_boxes, processed_crops)
+        filtered = [(box, text, crop, conf, color)
+                    for box, (text, conf, color, crop) in zip(final_boxes, processed_crops)
                     if text and text.strip() != ""]
         if not filtered: 
             return []
 
-        boxes, texts, crops_out = zip(*filtered)
+        boxes, texts, crops_out, confs, colors = zip(*filtered)
 
         boxes = list(boxes)
         texts = list(texts)
@@ -228,14 +502,21 @@ class OCR:
         boxes = [(int(x/scale), int(y/scale), int(w/scale), int(h/scale)) for x, y, w, h in boxes]
 
         # Sort and group lines
-        items = sorted(zip(boxes, texts, crops_out), key=lambda x: (x[0][1]+x[0][3]//2, x[0][0]))
+        extra = []
+        if return_conf:
+            extra.append([float(c) for c in confs])
+        if return_color:
+            extra.append(colors)
+        items = zip(boxes, texts, crops_out, *extra)
+        items = sorted(items, key=lambda x: (x[0][1]+x[0][3]//2, x[0][0]))
         Y_lines, cur, prev_y = [], [], items[0][0][1]+items[0][0][3]//2
-        for b, t, c in items:
+        for item in items:
+            b = item[0]
             y_mid = b[1]+b[3]//2
             if abs(y_mid-prev_y) > b[3]*0.4:
                 Y_lines.append(cur)
                 cur = []
-            cur.append((b, t, c))
+            cur.append(item)
             prev_y = y_mid
         if cur: Y_lines.append(cur)
 
@@ -243,12 +524,13 @@ class OCR:
         for line in Y_lines:
             line = sorted(line, key=lambda x: x[0][0])
             cur, prev_x_end = [], line[0][0][0]+line[0][0][2]
-            for b, t, c in line:
+            for item in line:
+                b = item[0]
                 x_start, x_end = b[0], b[0]+b[2]
                 if x_start-prev_x_end > 80:
                     final_lines.append(cur)
                     cur = []
-                cur.append((b, t, c))
+                cur.append(item)
                 prev_x_end = x_end
             if cur: final_lines.append(cur)
 
@@ -0,0 +1,106 @@
+import math
+from collections import deque
+
+
+class BoxGrid:
+    # Uniform grid over (left, top) of [x,y,w,h] boxes.
+    # Every box gets an increasing sequence id, so "first in queue order"
+    # is the smallest id among the matching candidates.
+    def __init__(self, cell_w, cell_h):
+        self.cell_w = cell_w
+        self.cell_h = cell_h
+        self.cells = {}  # {(cx, cy): {seq: box}}
+        self.where = {}  # {seq: (cx, cy)}
+        self.max_w = 0
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_w)), int(math.floor(y / self.cell_h))
+
+    def add(self, seq, box):
+        key = self._cell(box[0], box[1])
+        self.cells.setdefault(key, {})[seq] = box
+        self.where[seq] = key
+        self.max_w = max(self.max_w, box[2])
+
+    def remove(self, seq):
+        key = self.where.pop(seq)
+        cell = self.cells[key]
+        del cell[seq]
+        if not cell:
+            del self.cells[key]
+
+    def query(self, l0, t0, r0, x_tol, y_tol):
+        # Candidates whose top is within y_tol and whose x range can reach [l0, r0] +- x_tol
+        cx0, cy0 = self._cell(l0 - x_tol - self.max_w, t0 - y_tol)
+        cx1, cy1 = self._cell(r0 + x_tol, t0 + y_tol)
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    yield from cell.items()
+
+
+def condense_boxes(boxes, x_tol, y_tol, x_limit_px=300):
+    """
+    Merge [x,y,w,h] boxes lying on the same text line.
+
+    Same result as the queue based merge: each popped box merges with the
+    first queued box that passes the x/y tolerance tests and the x_limit_px
+    cap, the merged box is queued at the back. Originals are kept and every
+    merged box is added to the output.
+    """
+    if not boxes:
+        return []
+
+    boxes = [tuple(b) for b in boxes]
+    results = dict.fromkeys(boxes, True)
+
+    grid = BoxGrid(cell_w=64, cell_h=max(8.0, y_tol))
+    queue = deque(range(len(boxes)))
+    alive = dict(enumerate(boxes))  # {seq: box} still waiting in the queue
+    for seq, box in alive.items():
+        grid.add(seq, box)
+    next_seq = len(boxes)
+
+    while queue:
+        seq0 = queue.popleft()
+        if seq0 not in alive:
+            continue  # already merged into another box
+        box0 = alive.pop(seq0)
+        grid.remove(seq0)
+        l0, t0, r0, b0 = box0[0], box0[1], box0[0]+box0[2], box0[1]+box0[3]
+        h0 = box0[3]
+
+        match = None
+        for seq1, box1 in grid.query(l0, t0, r0, x_tol, y_tol):
+            if match is not None and seq1 > match[0]:
+                continue
+            l1, t1, r1, b1 = box1[0], box1[1], box1[0]+box1[2], box1[1]+box1[3]
+            h1 = box1[3]
+
+            x_pass = not (r1 < l0 - x_tol or r0 < l1 - x_tol)
+            y_pass = abs(t1 - t0) <= y_tol and abs(h1 - h0) < min(h0, h1) * 0.5
+            if not (x_pass and y_pass):
+                continue
+
+            nl, nr = min(l0, l1), max(r0, r1)
+            if nr - nl >= x_limit_px:
+                continue  # box too long
+            nt, nb = min(t0, t1), max(b0, b1)
+            match = (seq1, (nl, nt, nr - nl, nb - nt))
+
+        if match is None:
+            continue
+
+        seq1, new_box = match
+        del alive[seq1]
+        grid.remove(seq1)
+
+        # Keep original boxes, just add the merged one
+        results[new_box] = True
+        queue.append(next_seq)
+        alive[next_seq] = new_box
+        grid.add(next_seq, new_box)
+        next_seq += 1
+
+    return [b for b, keep in results.items() if keep]
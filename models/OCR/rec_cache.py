@@ -0,0 +1,112 @@
+import os
+import struct
+import hashlib
+import numpy as np
+from core.cache import ByteLRU, atomic_write, Autosave
+
+
+# On-disk record: 8-byte key | float32 conf | uint16 text length | utf-8 text
+#                 | uint8 has color [| uint8 r, g, b, name length | ascii name]  (RECC2 only)
+_HEADER = b"RECC2"
+_HEADER_V1 = b"RECC1"
+_RECORD = struct.Struct("<8sfH")
+_COLOR = struct.Struct("<BBBB")
+# Python-side bytes per entry measured with tracemalloc: key bytes, 3-tuple, float,
+# text str header, the LRU (value, size) pair and the OrderedDict slot and link node,
+# plus a 4-tuple and str for a color
+_ENTRY_OVERHEAD = 370
+_COLOR_OVERHEAD = 115
+
+
+class RecognitionCache:
+    """
+    Byte-budgeted LRU of crop content hash -> (text, conf, color).
+    Only the recognition result is kept, never the crop itself; color is the
+    host side (r, g, b, name) text color or None. When a path
+    is given the cache is loaded from it on start and written back on a
+    background thread every `save_every` new entries, and at exit.
+    """
+    def __init__(self, max_bytes=32 * 1024 * 1024, path=None, save_every=500):
+        self.path = path
+        self.lru = ByteLRU(max_bytes)  # {key: (text, conf, color)}
+        self.autosave = None
+
+        if path:
+            self.load()
+            self.autosave = Autosave(self.save, save_every, name="rec-cache-save")
+
+    @staticmethod
+    def key(crop: np.ndarray):
+        h = hashlib.blake2b(np.ascontiguousarray(crop).data, digest_size=8)
+        h.update(str(crop.shape).encode())
+        return h.digest()
+
+    @staticmethod
+    def _entry_size(text, color=None):
+        size = _ENTRY_OVERHEAD + len(text.encode("utf-8"))
+        return size if color is None else size + _COLOR_OVERHEAD + len(color[3])
+
+    def get(self, key):
+        return self.lru.get(key)
+
+    def put(self, key, text, conf, color=None):
+        self.lru.put(key, (text, float(conf), color), self._entry_size(text, color))
+        if self.autosave is not None:
+            self.autosave.mark()
+
+    def stats(self):
+        return self.lru.stats()
+
+    # ---------- persistence ----------
+
+    def save(self):
+        if not self.path:
+            return
+        buf = bytearray(_HEADER)
+        for key, (text, conf, color) in self.lru.items():  # oldest first, so load keeps LRU order
+            raw = text.encode("utf-8")[:0xFFFF]
+            buf += _RECORD.pack(key, conf, len(raw)) + raw
+            if color is None:
+                buf += b"\0"
+            else:
+                r, g, b, name = color
+                name = name.encode("ascii", "replace")[:0xFF]
+                buf += b"\1" + _COLOR.pack(r, g, b, len(name)) + name
+
+        atomic_write(self.path, bytes(buf))
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        has_color = data.startswith(_HEADER)
+        if not has_color and not data.startswith(_HEADER_V1):
+            return
+
+        pos = len(_HEADER)
+        while pos + _RECORD.size <= len(data):
+            key, conf, n = _RECORD.unpack_from(data, pos)
+            pos += _RECORD.size
+            if pos + n > len(data):
+                break  # truncated tail
+            text = data[pos:pos + n].decode("utf-8", "replace")
+            pos += n
+
+            color = None
+            if has_color:
+                if pos >= len(data):
+                    break
+                flag = data[pos]
+                pos += 1
+                if flag:
+                    if pos + _COLOR.size > len(data):
+                        break
+                    r, g, b, m = _COLOR.unpack_from(data, pos)
+                    pos += _COLOR.size
+                    if pos + m > len(data):
+                        break
+                    color = (r, g, b, data[pos:pos + m].decode("ascii", "replace"))
+                    pos += m
+            self.lru.put(key, (text, conf, color), self._entry_size(text, color))
+        self.lru.evictions = 0